@@ -0,0 +1,48 @@
+"""
+Benchmarks for api module
+Run with `make benchmarks`, these are not part of the test suite
+"""
+import timeit
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+class BenchmarkMixin:
+    """
+    Helpers for timing and reporting benchmarked callables
+    """
+
+    repeat = 5
+
+    def measure(self, label, func, number=1):
+        """
+        Time func and print best run with number of queries executed,
+        including queries on connections func opens in other threads
+        :param label: name to report measurement as
+        :param func: callable to benchmark
+        :param number: times to call func per run
+        :returns float: best time in seconds per call
+        """
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def track_connection(connection, **_):
+            # wrappers outlive reconnects so are only tracked once
+            if count_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(count_query)
+
+        connection_created.connect(track_connection)
+        try:
+            with connection.execute_wrapper(count_query):
+                func()
+        finally:
+            connection_created.disconnect(track_connection)
+        best = min(timeit.repeat(func, number=number, repeat=self.repeat)) / number
+        print(
+            "{:<48} {:>10.3f} ms {:>8} queries".format(label, best * 1000, len(queries))
+        )
+        return best
@@ -0,0 +1,73 @@
+"""
+Benchmark scope flattening
+"""
+from django.test import TestCase
+
+from api.benchmarks import BenchmarkMixin
+from api.constants import PermissionCodes
+from api.models import Account, Auth, Scope
+from api.tests import FixturesMixin
+
+
+def flatten_scopes_bfs(scope_ids):
+    """
+    Breadth first flatten querying every scope visited
+    """
+    pancake = set()
+    queue = set(scope_ids)
+    while queue:
+        sid = queue.pop()
+        if sid not in pancake:
+            try:
+                scope = Scope.objects.get(pk=sid)
+                pancake.add(sid)
+                queue.update(scope.includes.values_list("id", flat=True))
+            except Scope.DoesNotExist:
+                pass
+    return pancake
+
+
+class ScopeFlattenBenchmark(BenchmarkMixin, FixturesMixin, TestCase):
+    """
+    Compare closure lookup against per node queries
+    """
+
+    auth_count = 100
+
+    def setUp(self):
+        super().setUp()
+        user = Account.objects.get(pk=3)
+        scopes = list(Scope.objects.all())
+        self.auth_scope_ids = []
+        for _ in range(self.auth_count):
+            auth = Auth.objects.create(user=user)
+            auth.scopes.set(scopes)
+            self.auth_scope_ids.append([scope.id for scope in scopes])
+
+    def test_flatten_many_scopes(self):
+        """
+        Flatten every scope for a list of auths
+        """
+        label = "flatten {} auths x {} scopes ({})".format(
+            self.auth_count, len(self.auth_scope_ids[0]), "{}"
+        )
+        for ids in self.auth_scope_ids:
+            self.assertSetEqual(flatten_scopes_bfs(ids), Auth.flatten_scopes(ids))
+        self.measure(
+            label.format("bfs"),
+            lambda: [flatten_scopes_bfs(ids) for ids in self.auth_scope_ids],
+        )
+        self.measure(
+            label.format("closure"),
+            lambda: [Auth.flatten_scopes(ids) for ids in self.auth_scope_ids],
+        )
+
+    def test_flatten_manage_scope(self):
+        """
+        Flatten the manage scope, the most common granted scope
+        """
+        ids = [Scope.objects.get(codename=PermissionCodes.Account.MANAGE).id]
+        self.measure("flatten manage scope (bfs)", lambda: flatten_scopes_bfs(ids), 100)
+        self.measure(
+            "flatten manage scope (closure)", lambda: Auth.flatten_scopes(ids), 100
+        )
@@ -0,0 +1,105 @@
+"""
+Benchmark sqlite tuning profile
+"""
+import threading
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.benchmarks import BenchmarkMixin
+from api.models import Account
+from api.tests import FixturesMixin
+
+
+@skipUnless(connection.vendor == "sqlite", "pragmas are sqlite only")
+class SqliteConcurrencyBenchmark(BenchmarkMixin, FixturesMixin, TransactionTestCase):
+    """
+    Compare default sqlite settings against the DB_TUNE profile under mixed load
+    """
+
+    repeat = 3
+    writers = 4
+    readers = 4
+    requests = 50
+
+    def setUp(self):
+        super().setUp()
+        self.user = Account.objects.get(pk=3)
+        self.url = reverse("trip-list")
+        self.addCleanup(self.configure, dict(connections.settings[DEFAULT_DB_ALIAS]))
+        self.addCleanup(self.reset_journal)
+
+    @staticmethod
+    def configure(options):
+        """
+        Update settings of the default database used by new connections
+        """
+        database = connections.settings[DEFAULT_DB_ALIAS]
+        database.update(options)
+
+    @staticmethod
+    def reset_journal():
+        """
+        Return database file to the default rollback journal
+        Journal mode is kept in the file so it outlives connections
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode = DELETE")
+
+    def run_load(self):
+        """
+        Post and list trips from concurrent clients each in its own thread,
+        connections are released after every request like the request handler
+        """
+        barrier = threading.Barrier(self.writers + self.readers)
+
+        def run(method, data):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                for _ in range(self.requests):
+                    response = getattr(client, method)(self.url, data)
+                    self.assertLess(response.status_code, 300)
+                    close_old_connections()
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=run, args=("post", {"length_time": 60}))
+            for _ in range(self.writers)
+        ]
+        threads += [
+            threading.Thread(target=run, args=("get", {"limit": 20}))
+            for _ in range(self.readers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_trips(self):
+        """
+        Serve trip writes and reads at the same time under each profile
+        """
+        total = (self.writers + self.readers) * self.requests
+        label = "{} clients x {} trip requests ({})".format(
+            self.writers + self.readers, self.requests, "{}"
+        )
+        untuned = {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {}}
+        profiles = (
+            ("default", {}, untuned),
+            ("pragmas", settings.SQLITE_TUNED_PRAGMAS, untuned),
+            ("tuned", settings.SQLITE_TUNED_PRAGMAS, settings.SQLITE_TUNED_DATABASE),
+        )
+        for name, pragmas, options in profiles:
+            self.reset_journal()
+            connection.close()
+            self.configure(options)
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                best = self.measure(label.format(name), self.run_load)
+            print("{:<48} {:>10.1f} requests/s".format("  throughput", total / best))
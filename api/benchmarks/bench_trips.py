@@ -0,0 +1,184 @@
+"""
+Benchmark trip endpoints
+"""
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from api.benchmarks import BenchmarkMixin
+from api.models import Account, Trip
+from api.pagination import TripPagination
+from api.serializers import TripSerializer
+from api.tests import FixturesMixin
+
+
+class TripIngestBenchmark(BenchmarkMixin, FixturesMixin, APITestCase):
+    """
+    Compare uploading trips one request at a time against one bulk request
+    """
+
+    repeat = 3
+    trip_count = 500
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(Account.objects.get(pk=3))
+        self.trips = [
+            {"length_distance": 10 * i, "length_time": 60 * i}
+            for i in range(self.trip_count)
+        ]
+
+    def test_trips_ingest(self):
+        """
+        Upload a device sync worth of trips
+        """
+        url = reverse("trip-list")
+        label = "upload {} trips ({})".format(self.trip_count, "{}")
+        self.measure(
+            label.format("single"),
+            lambda: [self.client.post(url, trip, format="json") for trip in self.trips],
+        )
+        self.measure(
+            label.format("bulk"),
+            lambda: self.client.post(url, self.trips, format="json"),
+        )
+
+
+class TripPaginationBenchmark(BenchmarkMixin, FixturesMixin, APITestCase):
+    """
+    Compare page latency of offset and cursor pagination deep into history
+    """
+
+    trip_count = 20000
+    offsets = (0, 5000, 10000, 19990)
+
+    def setUp(self):
+        super().setUp()
+        account = Account.objects.get(pk=3)
+        Trip.objects.bulk_create(
+            (Trip(account=account, length_time=i) for i in range(self.trip_count)),
+            batch_size=1000,
+        )
+        # spread trips over days as a device history would be
+        Trip.objects.update(
+            date_created=RawSQL("date('2000-01-01', '+' || (id / 3) || ' days')", [])
+        )
+        self.client.force_authenticate(account)
+
+    def cursor_at(self, offset):
+        """
+        Cursor pointing to the trip before offset
+        """
+        if not offset:
+            return {"pagination": "cursor"}
+        ordering = TripPagination.ordering
+        position = list(
+            Trip.objects.order_by(*ordering).values_list(*ordering)[offset - 1]
+        )
+        return {"cursor": TripPagination.encode_cursor(position)}
+
+    def test_trips_page_depth(self):
+        """
+        List a page of trips at increasing depth
+        """
+        url = reverse("trip-list")
+        for offset in self.offsets:
+            self.measure(
+                "list trips at {} (offset)".format(offset),
+                lambda o=offset: self.client.get(url, {"offset": o}),
+            )
+            params = self.cursor_at(offset)
+            self.measure(
+                "list trips at {} (cursor)".format(offset),
+                lambda p=params: self.client.get(url, p),
+            )
+
+
+class TripExportBenchmark(BenchmarkMixin, FixturesMixin, APITestCase):
+    """
+    Compare reading a full history page by page against a streamed export
+    """
+
+    repeat = 3
+    trip_count = 20000
+    page_size = 100
+
+    def setUp(self):
+        super().setUp()
+        self.account = Account.objects.get(pk=3)
+        Trip.objects.bulk_create(
+            (Trip(account=self.account, length_time=i) for i in range(self.trip_count)),
+            batch_size=1000,
+        )
+        self.client.force_authenticate(self.account)
+
+    def read_pages(self):
+        """
+        Follow cursor pages until the history is exhausted
+        """
+        url = reverse("account-trips", args=[self.account.id])
+        params = {"pagination": "cursor", "limit": self.page_size}
+        while url:
+            url = self.client.get(url, params).json()["next"]
+            params = None
+
+    def read_export(self, export_type):
+        """
+        Consume a streamed export
+        """
+        url = reverse("account-trip-export", args=[self.account.id])
+        response = self.client.get(url, {"type": export_type})
+        for _ in response.streaming_content:
+            pass
+
+    def test_trips_export(self):
+        """
+        Read every trip of an account
+        """
+        label = "read {} trips ({})".format(self.trip_count, "{}")
+        self.measure(label.format("pages"), self.read_pages)
+        for export_type in ("csv", "ndjson", "gpx"):
+            self.measure(
+                label.format("export " + export_type),
+                lambda t=export_type: self.read_export(t),
+            )
+
+
+class TripRepresentBenchmark(BenchmarkMixin, FixturesMixin, APITestCase):
+    """
+    Compare representing trips through the model serializer against values
+    """
+
+    trip_count = 10000
+
+    def setUp(self):
+        super().setUp()
+        account = Account.objects.get(pk=3)
+        Trip.objects.bulk_create(
+            (Trip(account=account, length_time=i) for i in range(self.trip_count)),
+            batch_size=1000,
+        )
+        self.trips = Trip.objects.order_by("id")[: self.trip_count]
+
+    def test_trips_represent(self):
+        """
+        Read and represent a large page of trips
+        """
+        label = "represent {} trips ({})".format(self.trip_count, "{}")
+        serializer = self.measure(
+            label.format("serializer"),
+            lambda: TripSerializer(list(self.trips), many=True).data,
+        )
+        values = self.measure(
+            label.format("values"),
+            lambda: TripSerializer.represent_values(
+                self.trips.values(*TripSerializer.VALUES)
+            ),
+        )
+        print(
+            "{:<48} {:>10.2f} us {:>10.2f} us".format(
+                "per trip (serializer, values)",
+                serializer / self.trip_count * 1e6,
+                values / self.trip_count * 1e6,
+            )
+        )
@@ -0,0 +1,220 @@
+"""
+Caching helpers for api module
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import uuid4
+
+from django.core.cache import cache as backend
+
+from api.constants import Limits
+
+_REQUEST_CACHE = ContextVar("request_cache", default=None)
+
+
+@contextmanager
+def request_scope():
+    """
+    Context within which memoized values are shared,
+    entered once per request by RequestCacheMiddleware
+    """
+    token = _REQUEST_CACHE.set({})
+    try:
+        yield
+    finally:
+        _REQUEST_CACHE.reset(token)
+
+
+def memoize(key, func):
+    """
+    Get value stored under key for the current request,
+    computing and storing it with func if missing
+    Always calls func when outside a request scope
+    :param key: hashable identity of the value
+    :param func: callable returning value to store
+    """
+    cache = _REQUEST_CACHE.get()
+    if cache is None:
+        return func()
+    if key not in cache:
+        cache[key] = func()
+    return cache[key]
+
+
+def forget(*keys):
+    """
+    Remove stored values for keys from the current request
+    """
+    cache = _REQUEST_CACHE.get()
+    if cache is None:
+        return
+    for key in keys:
+        cache.pop(key, None)
+
+
+class LRUCache:
+    """
+    Thread safe in-process least recently used cache with expiry
+    Entries missing locally are read through the django cache backend,
+    shared with other processes only when CACHES is a shared backend.
+    Deleting never reaches copies other processes hold, they expire
+    """
+
+    def __init__(self, prefix, maxsize, timeout):
+        """
+        :param str prefix: namespace of keys in the cache backend
+        :param int maxsize: entries kept in process
+        :param int timeout: seconds entries are kept
+        """
+        self.prefix = prefix
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def backend_key(self, key):
+        """
+        Key of entry in the cache backend
+        """
+        return "{}:{}".format(self.prefix, key)
+
+    def get(self, key, default=None):
+        """
+        Get value stored under key
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    return value
+                del self.entries[key]
+        value = backend.get(self.backend_key(key))
+        if value is None:
+            return default
+        self._store(key, value)
+        return value
+
+    def set(self, key, value):
+        """
+        Store value under key in process and in the cache backend
+        """
+        backend.set(self.backend_key(key), value, self.timeout)
+        self._store(key, value)
+
+    def delete(self, key):
+        """
+        Remove value stored under key everywhere
+        """
+        backend.delete(self.backend_key(key))
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove all values stored in process
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def _store(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+class Snapshot:
+    """
+    Values built once per version and kept in process
+    Invalidating changes the version in the cache backend so every process
+    sharing the backend drops values of older versions, the version is read
+    once per request. With the default per process backend other processes
+    keep their values until restarted
+    """
+
+    # name of the value shared through the cache backend
+    SHARED = "shared"
+
+    def __init__(self, prefix):
+        """
+        :param str prefix: namespace of keys in the cache backend
+        """
+        self.prefix = prefix
+        self.values = (None, {})
+
+    def version_key(self):
+        """
+        Key of current version in the cache backend
+        """
+        return "{}:version".format(self.prefix)
+
+    def version(self):
+        """
+        Current version of values shared through the cache backend
+        """
+        return memoize(
+            self.version_key(),
+            lambda: backend.get_or_set(self.version_key(), lambda: uuid4().hex, None),
+        )
+
+    def current(self):
+        """
+        Current version and its values in process, emptied when version changes
+        :returns tuple: version and map of value name to value
+        """
+        version = self.version()
+        values = self.values
+        if values[0] != version:
+            values = self.values = (version, {})
+        return values
+
+    def local(self, name, build):
+        """
+        Get value of current version kept only in this process
+        :param str name: name of value
+        :param build: callable returning value to keep
+        """
+        _, values = self.current()
+        if name not in values:
+            values[name] = build()
+        return values[name]
+
+    def get(self, build):
+        """
+        Get value of current version shared through the cache backend,
+        building and storing it if missing
+        :param build: callable returning value to store
+        """
+        version, values = self.current()
+        if self.SHARED not in values:
+            key = "{}:{}".format(self.prefix, version)
+            value = backend.get(key)
+            if value is None:
+                value = build()
+                backend.set(key, value, None)
+            values[self.SHARED] = value
+        return values[self.SHARED]
+
+    def invalidate(self):
+        """
+        Move to a new version so values are rebuilt on next access
+        """
+        backend.set(self.version_key(), uuid4().hex, None)
+        forget(self.version_key())
+        self.values = (None, {})
+
+
+# token key to account id
+tokens = LRUCache("token", Limits.PRINCIPAL_CACHE_SIZE, Limits.PRINCIPAL_CACHE_TTL)
+# account id to authenticated account with granted scope ids
+principals = LRUCache(
+    "principal", Limits.PRINCIPAL_CACHE_SIZE, Limits.PRINCIPAL_CACHE_TTL
+)
+# scope registry and closure in process, serialized scope tree with its etag
+scopes = Snapshot("scopes")
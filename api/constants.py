@@ -3,7 +3,7 @@ Api constants
 """
 from django.conf import settings
 
-from jogger.settings import SMTP_HOST, SMTP_PORT, SMTP_USER
+from jogger.settings import SMTP_HOST, SMTP_PORT, SMTP_USER, TRIP_BATCH_SIZE
 
 MAIL_HOST = SMTP_HOST
 MAIL_FROM = "{}@{}".format(MAIL_HOST, SMTP_USER)
@@ -19,6 +19,39 @@ class Limits:
     ACCOUNT_MANAGER = 5
     # limit to managing
     ACCOUNT_MANAGED = 25
+    # limit to trips in one bulk upload
+    TRIP_BULK = 5000
+    # trips inserted per query in bulk upload
+    TRIP_BULK_BATCH = TRIP_BATCH_SIZE
+    # trips read from the database at a time when exporting
+    TRIP_EXPORT_CHUNK = 2000
+    # trip changes sent in one sync response
+    TRIP_SYNC_LIMIT = 1000
+    # seconds after a change is stamped that its transaction may still commit,
+    # changes this recent are sent again by the next sync
+    TRIP_SYNC_OVERLAP = 60
+    # attempts at sending a mail before giving up
+    MAIL_ATTEMPTS = 5
+    # seconds before first retry of a mail, doubled after each attempt
+    MAIL_BACKOFF = 60
+    # seconds a mail is reserved for the worker sending it
+    MAIL_LEASE = 300
+    # authenticated accounts cached per process
+    PRINCIPAL_CACHE_SIZE = 1024
+    # seconds an authenticated account or token is cached, other processes
+    # only drop their copy on expiry whatever the CACHES backend, so revoked
+    # tokens and deactivated accounts keep working in them for up to this long
+    PRINCIPAL_CACHE_TTL = 60
+    # seconds a manager authorisation code can be confirmed
+    AUTH_CODE_TTL = 7 * 24 * 60 * 60
+    # days dead authorisations are kept before being pruned
+    AUTH_RETENTION_DAYS = 30
+    # authorisations deleted per query when pruning
+    AUTH_PRUNE_CHUNK = 1000
+    # threads checking sign in passwords
+    LOGIN_WORKERS = 4
+    # sign in password checks running or waiting before refusing more
+    LOGIN_QUEUE = 32
 
 
 class Methods:
@@ -33,6 +66,16 @@ class Methods:
     DELETE = "DELETE"
 
 
+class Periods:
+    """
+    Trip statistics reporting periods
+    """
+
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
 class PermissionCodes:
     """
     All permission
@@ -0,0 +1,79 @@
+"""
+Api streamed trip export formats
+"""
+import csv
+import json
+from xml.sax.saxutils import escape
+
+from api.parsers import NDJSONParser
+from api.serializers import TripSerializer
+
+# trip columns read for export, in output order
+COLUMNS = TripSerializer.VALUES
+# names of exported fields matching the trip serializer
+FIELDS = TripSerializer.Meta.fields
+
+
+class Echo:
+    """
+    File like object returning what is written to it
+    """
+
+    @staticmethod
+    def write(value):
+        return value
+
+
+def _values(row):
+    """
+    Trip row as json compatible values keyed by field name
+    """
+    values = dict(zip(FIELDS, row))
+    values["date_created"] = values["date_created"].isoformat()
+    return values
+
+
+def csv_lines(rows):
+    """
+    Comma separated lines with a header
+    :param rows: iterable of trip column tuples
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    """
+    Json object per line
+    :param rows: iterable of trip column tuples
+    """
+    for row in rows:
+        yield json.dumps(_values(row)) + "\n"
+
+
+def gpx_lines(rows):
+    """
+    Gpx document with a summary track per trip
+    :param rows: iterable of trip column tuples
+    """
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<gpx version="1.1" creator="jogger"'
+    yield ' xmlns="http://www.topografix.com/GPX/1/1">\n'
+    for row in rows:
+        values = _values(row)
+        yield (
+            "<trk><name>Trip {id}</name>"
+            "<desc>{length_distance} m in {length_time} s on {date_created}</desc>"
+            "<number>{id}</number></trk>\n"
+        ).format(**{key: escape(str(value)) for key, value in values.items()})
+    yield "</gpx>\n"
+
+
+# export type to content type and line generator
+FORMATS = {
+    "csv": ("text/csv", csv_lines),
+    "ndjson": (NDJSONParser.media_type, ndjson_lines),
+    "gpx": ("application/gpx+xml", gpx_lines),
+}
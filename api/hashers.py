@@ -0,0 +1,100 @@
+"""
+Api password and code hashers
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from api import utils
+from api.constants import Limits
+
+
+def keyed_digest(value):
+    """
+    Fixed length keyed digest of value using the project secret
+    :param str value: value to digest
+    :rtype: str
+    """
+    return salted_hmac(__name__, value, algorithm="sha256").hexdigest()
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher with iterations configured by PASSWORD_ITERATIONS
+    Passwords hashed with other iterations are rehashed on sign in
+    """
+
+    iterations = settings.PASSWORD_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
+
+
+class HMACSHA256PasswordHasher(hashers.BasePasswordHasher):
+    """
+    Fast keyed hasher for high entropy random codes
+    Not suitable for user chosen passwords
+    """
+
+    algorithm = "hmac_sha256"
+
+    def encode(self, password, salt):
+        self._check_encode_args(password, salt)
+        return "{}${}${}".format(self.algorithm, salt, keyed_digest(salt + password))
+
+    def decode(self, encoded):
+        algorithm, salt, digest = encoded.split("$", 2)
+        assert algorithm == self.algorithm
+        return {"algorithm": algorithm, "hash": digest, "salt": salt}
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        return constant_time_compare(encoded, self.encode(password, decoded["salt"]))
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            "algorithm": decoded["algorithm"],
+            "salt": hashers.mask_hash(decoded["salt"]),
+            "hash": hashers.mask_hash(decoded["hash"]),
+        }
+
+    def harden_runtime(self, password, encoded):
+        pass
+
+
+_LOGIN_POOL = ThreadPoolExecutor(
+    max_workers=Limits.LOGIN_WORKERS, thread_name_prefix="login"
+)
+_LOGIN_SLOTS = BoundedSemaphore(Limits.LOGIN_QUEUE)
+
+
+def check_account_password(account, password):
+    """
+    Check password of account on the bounded login pool
+    Rehashes and saves the password if the hasher settings changed
+    :param account: account to check
+    :param str password: plain text password
+    :raises APIException: if too many checks are waiting
+    :returns bool: True if password is correct
+    """
+    if not _LOGIN_SLOTS.acquire(blocking=False):
+        utils.raise_api_exc(
+            APIException("too many sign in attempts, try again later"),
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    try:
+        outdated = []
+        is_correct = _LOGIN_POOL.submit(
+            hashers.check_password, password, account.password, outdated.append
+        ).result()
+        if outdated:
+            account.password = _LOGIN_POOL.submit(
+                hashers.make_password, password
+            ).result()
+            account.save(update_fields=["password"])
+    finally:
+        _LOGIN_SLOTS.release()
+    return is_correct
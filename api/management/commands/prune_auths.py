@@ -0,0 +1,37 @@
+"""
+Prune dead authorisations command
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.constants import Limits
+from api.models import Auth
+
+
+class Command(BaseCommand):
+    """
+    Delete inactive authorisations older than the retention window
+    """
+
+    help = "Delete dead authorisations in chunks once past retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=Limits.AUTH_RETENTION_DAYS,
+            help="days dead authorisations are kept",
+        )
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=Limits.AUTH_PRUNE_CHUNK,
+            help="authorisations deleted per query",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now().date() - timedelta(days=options["days"])
+        count = Auth.prune(before, options["chunk"])
+        self.stdout.write("Deleted {} dead authorisations".format(count))
@@ -0,0 +1,18 @@
+"""
+Purge expired authorisation codes command
+"""
+from django.core.management.base import BaseCommand
+
+from api.models import Auth
+
+
+class Command(BaseCommand):
+    """
+    Delete pending manager authorisations that can no longer be confirmed
+    """
+
+    help = "Delete pending authorisations with expired codes"
+
+    def handle(self, *args, **options):
+        count = Auth.purge_expired()
+        self.stdout.write("Deleted {} expired authorisations".format(count))
@@ -0,0 +1,27 @@
+"""
+Rebuild trip rollups command
+"""
+from django.core.management.base import BaseCommand
+
+from api.models import TripRollup
+
+
+class Command(BaseCommand):
+    """
+    Recompute per account trip rollups from scratch
+    """
+
+    help = "Recompute daily and weekly trip rollups from trips"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--account",
+            type=int,
+            action="append",
+            dest="accounts",
+            help="id of account to rebuild, can be repeated, defaults to all",
+        )
+
+    def handle(self, *args, **options):
+        count = TripRollup.rebuild(options["accounts"])
+        self.stdout.write("Created {} trip rollups".format(count))
@@ -0,0 +1,48 @@
+"""
+Send queued mail command
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import Mail
+from api.utils import MailConnection
+
+
+class Command(BaseCommand):
+    """
+    Deliver mail from the outbox over a persistent smtp connection
+    """
+
+    help = "Send queued mail, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="exit once no mail is due"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="seconds to wait when no mail is due",
+        )
+        parser.add_argument(
+            "--batch", type=int, default=100, help="mails claimed at a time"
+        )
+
+    def handle(self, *args, **options):
+        with MailConnection() as connection:
+            while True:
+                mails = Mail.claim_due(options["batch"])
+                for mail in mails:
+                    sent = mail.send(connection)
+                    self.stdout.write(
+                        "{} mail {} to {}".format(
+                            "Sent" if sent else "Failed", mail.id, mail.recievers
+                        )
+                    )
+                if not mails:
+                    if options["once"]:
+                        break
+                    connection.close()
+                    time.sleep(options["interval"])
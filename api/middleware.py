@@ -0,0 +1,31 @@
+"""
+Api middleware
+"""
+from api import routers
+from api.cache import request_scope
+
+
+class RequestCacheMiddleware:
+    """
+    Share memoized values for the lifetime of a request
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_scope():
+            return self.get_response(request)
+
+
+class ReadReplicaMiddleware:
+    """
+    Allow reads of safe requests to be routed to replicas
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.request_scope(request.method):
+            return self.get_response(request)
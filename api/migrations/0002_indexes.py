@@ -0,0 +1,75 @@
+# pylint: disable=F,I,E,R,C
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+        # sqlite rebuilds auth_user on alter dropping the email index
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="auth",
+            name="code",
+            field=models.TextField(null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="auth",
+            name="owner",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="authorities",
+                to="api.account",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="auth",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="authorised",
+                to="api.account",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="trip",
+            name="account",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="trips",
+                to="api.account",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auth",
+            index=models.Index(
+                fields=["user", "active"], name="api_auth_user_active_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auth",
+            index=models.Index(
+                fields=["owner", "active"], name="api_auth_owner_active_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["account", "date_created"], name="api_trip_account_created_idx"
+            ),
+        ),
+        # account email lives on the parent user table
+        migrations.RunSQL(
+            sql="CREATE INDEX api_account_email_idx ON auth_user (email)",
+            reverse_sql="DROP INDEX api_account_email_idx",
+        ),
+    ]
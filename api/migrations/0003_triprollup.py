@@ -0,0 +1,85 @@
+# pylint: disable=F,I,E,R,C
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncWeek
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    Trip = apps.get_model("api", "Trip")
+    TripRollup = apps.get_model("api", "TripRollup")
+    truncs = {"day": F("date_created"), "week": TruncWeek("date_created")}
+    for period, trunc in truncs.items():
+        totals = (
+            Trip.objects.order_by()
+            .annotate(period_date=trunc)
+            .values("account_id", "period_date")
+            .annotate(
+                total_trips=Count("id"),
+                total_time=Sum("length_time"),
+                total_distance=Sum("length_distance"),
+            )
+        )
+        TripRollup.objects.bulk_create(
+            (
+                TripRollup(
+                    account_id=row["account_id"],
+                    period=period,
+                    date=row["period_date"],
+                    trips=row["total_trips"],
+                    length_time=row["total_time"],
+                    length_distance=row["total_distance"],
+                )
+                for row in totals.iterator()
+            ),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("api", "0002_indexes")]
+
+    operations = [
+        migrations.CreateModel(
+            name="TripRollup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("day", "day"), ("week", "week")], max_length=4
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("trips", models.IntegerField(default=0)),
+                ("length_time", models.BigIntegerField(default=0)),
+                ("length_distance", models.BigIntegerField(default=0)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollups",
+                        to="api.account",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="triprollup",
+            constraint=models.UniqueConstraint(
+                fields=("account", "period", "date"), name="api_triprollup_unique"
+            ),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
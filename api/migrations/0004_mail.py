@@ -0,0 +1,42 @@
+# pylint: disable=F,I,E,R,C
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("api", "0003_triprollup")]
+
+    operations = [
+        migrations.CreateModel(
+            name="Mail",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sender", models.TextField()),
+                ("recievers", models.TextField()),
+                ("message", models.TextField()),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "next_attempt",
+                    models.DateTimeField(default=django.utils.timezone.now, null=True),
+                ),
+                ("date_created", models.DateTimeField(auto_now_add=True)),
+                ("date_sent", models.DateTimeField(null=True)),
+                ("error", models.TextField(null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["next_attempt"], name="api_mail_next_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# pylint: disable=F,I,E,R,C
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+# frozen copies of api.hashers.keyed_digest and Limits.AUTH_CODE_TTL
+KEY_SALT = "api.hashers"
+CODE_TTL = timedelta(days=7)
+
+
+def digest_codes(apps, schema_editor):
+    Auth = apps.get_model("api", "Auth")
+    expires = timezone.now() + CODE_TTL
+    for auth in Auth.objects.filter(code__isnull=False).only("id", "code"):
+        auth.code = salted_hmac(KEY_SALT, auth.code, algorithm="sha256").hexdigest()
+        auth.code_expires = expires
+        auth.save(update_fields=["code", "code_expires"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("api", "0004_mail")]
+
+    operations = [
+        migrations.AddField(
+            model_name="auth",
+            name="code_expires",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(digest_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="auth",
+            name="code",
+            field=models.CharField(max_length=64, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name="auth",
+            index=models.Index(
+                fields=["code_expires"], name="api_auth_code_expires_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# pylint: disable=F,I,E,R,C
+
+from django.db import migrations, models
+
+
+def date_to_datetime(apps, schema_editor):
+    # sqlite keeps the stored date text when the column type changes
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(
+            "UPDATE api_trip SET date_updated = date_updated || ' 00:00:00'"
+            " WHERE length(date_updated) = 10"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("api", "0005_auth_code_digest")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="trip",
+            name="date_updated",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(date_to_datetime, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["account", "date_updated"], name="api_trip_account_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# pylint: disable=F,I,E,R,C
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("api", "0006_trip_date_updated")]
+
+    operations = [
+        migrations.CreateModel(
+            name="TripDeletion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("trip_id", models.IntegerField()),
+                ("date_deleted", models.DateTimeField(auto_now_add=True)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deletions",
+                        to="api.account",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["account", "date_deleted"],
+                        name="api_tripdel_account_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# pylint: disable=F,I,E,R,C
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("api", "0007_tripdeletion")]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["account", "length_distance"],
+                name="api_trip_account_distance_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["account", "length_time"], name="api_trip_account_time_idx"
+            ),
+        ),
+    ]
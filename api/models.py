@@ -1,12 +1,23 @@
 """
 Jogger api model definitions
 """
+import smtplib
+from copy import copy
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
 from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth.models import User, Permission
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
 
-from api.constants import PermissionCodes
+from api import cache, utils
+from api.constants import Limits, Periods, PermissionCodes
+from api.hashers import HMACSHA256PasswordHasher, keyed_digest
 
 
 class Scope(Permission):
@@ -34,6 +45,66 @@ class Scope(Permission):
                     continue
                 permission = Permission.objects.get(codename=permission_code)
                 cls(permission_ptr=permission).save_base(raw=True)
+        cls.invalidate()
+
+    @classmethod
+    def registry(cls):
+        """
+        Map of every scope codename to its scope
+        Loaded once per scopes snapshot version, see Scope.invalidate
+        """
+        return cache.scopes.local(
+            "registry", lambda: {scope.codename: scope for scope in cls.objects.all()}
+        )
+
+    @classmethod
+    def get_by_codename(cls, codename):
+        """
+        Get scope from registry
+        :param codename: codename of scope to get
+        :raises Scope.DoesNotExist: if no scope has codename
+        """
+        try:
+            return cls.registry()[codename]
+        except KeyError:
+            raise cls.DoesNotExist(codename) from None
+
+    @classmethod
+    def closure(cls):
+        """
+        Map of every scope id to the set of scope ids it implicitly grants
+        Built once per scopes snapshot version from the permission graph
+        """
+        return cache.scopes.local("closure", cls.build_closure)
+
+    @classmethod
+    def build_closure(cls):
+        """
+        Compute the transitive closure of the permission graph
+        over the scopes in the registry
+        """
+        scope_ids = {code: scope.id for code, scope in cls.registry().items()}
+        closure = {}
+
+        def expand(codename, seen):
+            if codename in seen or codename not in scope_ids:
+                return
+            seen.add(codename)
+            for included in PermissionCodes.graph.get(codename, []):
+                expand(included, seen)
+
+        for codename, sid in scope_ids.items():
+            seen = set()
+            expand(codename, seen)
+            closure[sid] = frozenset(scope_ids[code] for code in seen)
+        return closure
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Drop cached scope data so it is rebuilt on next access in every process
+        """
+        cache.scopes.invalidate()
 
     @property
     def description(self):
@@ -59,13 +130,18 @@ class Account(User):
 
     reset_code = models.TextField(null=True)
 
+    # set on copies served from the principal cache, see get_principal
+    is_cached_principal = False
+
     def set_reset_code(self, plain_code, save=False):
         """
         Set account reset code
         :param plain_code: plain text code to encode
         :param save: flag controlling auto commit
         """
-        self.reset_code = make_password(plain_code)
+        self.reset_code = make_password(
+            plain_code, hasher=HMACSHA256PasswordHasher.algorithm
+        )
         if save:
             self.save()
 
@@ -75,7 +151,11 @@ class Account(User):
         :param plain_code: the plain text reset code to check
         :returns bool: True if the reset code match
         """
-        return check_password(plain_code, self.reset_code or "")
+        return check_password(
+            plain_code,
+            self.reset_code or "",
+            preferred=HMACSHA256PasswordHasher.algorithm,
+        )
 
     def clear_reset_code(self, save=False):
         """
@@ -90,27 +170,98 @@ class Account(User):
         """
         Scope used for managing user accounts
         """
-        return Scope.objects.get(codename=PermissionCodes.Account.MANAGE)
+        return Scope.get_by_codename(PermissionCodes.Account.MANAGE)
+
+    @classmethod
+    def get_manage_auths(cls):
+        """
+        Active authorisations granting the manage scope
+        """
+        return Auth.objects.filter(scopes=cls.get_manage_scope(), active=True)
+
+    @classmethod
+    def lock(cls, account_ids):
+        """
+        Lock account rows until the end of the current transaction
+        Sqlite has no row locks so a no-op update takes its write lock instead
+        :param list account_ids: ids of accounts to lock
+        """
+        accounts = cls.objects.filter(pk__in=sorted(account_ids))
+        if connection.features.has_select_for_update:
+            list(accounts.order_by("pk").select_for_update().values_list("pk"))
+        else:
+            accounts.update(reset_code=F("reset_code"))
+
+    @classmethod
+    def count_manage(cls, user_id, owner_id):
+        """
+        Count active manage authorisations around a user and owner in one query
+        :param int user_id: id of account being managed
+        :param int owner_id: id of managing account
+        :returns dict: counts of authorised, managers and managing
+        """
+        return (
+            cls.get_manage_auths()
+            .filter(Q(user_id=user_id, owner__isnull=False) | Q(owner_id=owner_id))
+            .aggregate(
+                authorised=Count("id", filter=Q(user_id=user_id, owner_id=owner_id)),
+                managers=Count("id", filter=Q(user_id=user_id)),
+                managing=Count("id", filter=Q(owner_id=owner_id)),
+            )
+        )
 
     @property
     def managers(self):
         """
         List of accounts managing this user
         """
-        mgr_scope = self.get_manage_scope()
-        return {
-            auth.owner.id for auth in mgr_scope.auths.filter(user=self, active=True)
-        }
+        return self.get_managers(self.id)
 
     @property
     def managing(self):
         """
         List of accounts this user manages
         """
-        mgr_scope = self.get_manage_scope()
-        return {
-            auth.user.id for auth in mgr_scope.auths.filter(owner=self, active=True)
-        }
+        return self.get_managing(self.id)
+
+    @classmethod
+    def get_managers(cls, account_id):
+        """
+        Ids of accounts managing account, memoized per request
+        """
+        return cache.memoize(
+            ("managers", account_id),
+            lambda: frozenset(
+                cls.get_manage_auths()
+                .filter(user_id=account_id, owner__isnull=False)
+                .values_list("owner_id", flat=True)
+            ),
+        )
+
+    @classmethod
+    def get_managing(cls, account_id):
+        """
+        Ids of accounts managed by account, memoized per request
+        """
+        return cache.memoize(
+            ("managing", account_id),
+            lambda: frozenset(
+                cls.get_manage_auths()
+                .filter(owner_id=account_id)
+                .values_list("user_id", flat=True)
+            ),
+        )
+
+    @staticmethod
+    def forget_manage(user_id, owner_id):
+        """
+        Clear memoized manage relationship between accounts
+        and the cached scopes granted to the managing account
+        :param user_id: id of account being managed
+        :param owner_id: id of managing account
+        """
+        cache.forget(("managers", user_id), ("managing", owner_id))
+        cache.principals.delete(owner_id)
 
     class Meta:
         permissions = ((PermissionCodes.Account.MANAGE, "Can manage account"),)
@@ -124,22 +275,123 @@ class Auth(models.Model):
     """
 
     user = models.ForeignKey(
-        Account, on_delete=models.CASCADE, related_name="authorised"
+        Account, on_delete=models.CASCADE, related_name="authorised", db_index=False
     )
     owner = models.ForeignKey(
-        Account, null=True, on_delete=models.SET_NULL, related_name="authorities"
+        Account,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="authorities",
+        db_index=False,
     )
-    code = models.TextField(null=True)
+    code = models.CharField(max_length=64, null=True, unique=True)
+    code_expires = models.DateTimeField(null=True)
     active = models.BooleanField(default=False)
     scopes = models.ManyToManyField(Scope, related_name="auths")
     date_created = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "active"], name="api_auth_user_active_idx"),
+            models.Index(fields=["owner", "active"], name="api_auth_owner_active_idx"),
+            models.Index(fields=["code_expires"], name="api_auth_code_expires_idx"),
+        ]
+
+    @staticmethod
+    def digest_code(plain_code):
+        """
+        Digest of plain code as stored in the code column
+        :param str plain_code: code sent to the authorised account
+        """
+        return keyed_digest(plain_code)
+
+    def set_code(self, plain_code, save=False):
+        """
+        Store digest of plain code and restart its expiry
+        :param str plain_code: code sent to the authorised account
+        :param bool save: persist changes on model
+        """
+        self.code = self.digest_code(plain_code)
+        self.code_expires = timezone.now() + timedelta(seconds=Limits.AUTH_CODE_TTL)
+        if save:
+            self.save(update_fields=["code", "code_expires"])
+
+    @classmethod
+    def get_pending(cls, plain_code):
+        """
+        Inactive authorisations with unexpired plain code
+        :param str plain_code: code sent to the authorised account
+        """
+        return cls.objects.filter(
+            code=cls.digest_code(plain_code),
+            active=False,
+            code_expires__gt=timezone.now(),
+        )
+
+    @classmethod
+    def compact(cls, user_id, owner_id, scope):
+        """
+        Keep only the latest authorisation granting just scope from user to owner
+        Older inactive duplicates are deleted so the latest can be reused
+        :param int user_id: id of account granting access
+        :param int owner_id: id of account access is granted to
+        :param Scope scope: only scope granted by the authorisation
+        :returns Auth: latest authorisation or None if there is none
+        """
+        auths = list(
+            cls.objects.filter(user_id=user_id, owner_id=owner_id, scopes=scope)
+            .exclude(scopes__in=Scope.objects.exclude(pk=scope.pk))
+            .order_by("-id")
+        )
+        if not auths:
+            return None
+        if len(auths) > 1:
+            cls.objects.filter(
+                id__in=[auth.id for auth in auths[1:]], active=False
+            ).delete()
+        return auths[0]
+
+    @classmethod
+    def prune(cls, before, chunk_size):
+        """
+        Delete dead authorisations created before date in chunks
+        Dead authorisations are inactive and have no code that can be confirmed
+        :param date before: only delete authorisations created before this
+        :param int chunk_size: maximum authorisations deleted per query
+        :returns int: number of authorisations deleted
+        """
+        dead = cls.objects.filter(active=False, date_created__lt=before).filter(
+            Q(code__isnull=True) | Q(code_expires__lte=timezone.now())
+        )
+        total = 0
+        while True:
+            auth_ids = list(
+                dead.order_by("id").values_list("id", flat=True)[:chunk_size]
+            )
+            if not auth_ids:
+                return total
+            with transaction.atomic():
+                _, deleted = cls.objects.filter(id__in=auth_ids).delete()
+            total += deleted.get(cls._meta.label, 0)
+
+    @classmethod
+    def purge_expired(cls):
+        """
+        Delete pending authorisations whose code has expired
+        :returns int: number of authorisations deleted
+        """
+        _, deleted = cls.objects.filter(
+            active=False, code__isnull=False, code_expires__lte=timezone.now()
+        ).delete()
+        return deleted.get(cls._meta.label, 0)
+
     @property
     def granted(self):
         """
         All scopes implicitly granted to this authorisation
+        Uses prefetched scopes when available
         """
-        return Auth.flatten_scopes(self.scopes.values_list("id", flat=True))
+        return Auth.flatten_scopes(scope.id for scope in self.scopes.all())
 
     def activate(self):
         """
@@ -148,16 +400,20 @@ class Auth(models.Model):
         """
         if self.code:
             self.code = None
+            self.code_expires = None
             self.active = True
-            self.save(update_fields=["code", "active"])
+            self.save(update_fields=["code", "code_expires", "active"])
+            Account.forget_manage(self.user_id, self.owner_id)
 
     def deactivate(self):
         """
         Deactivate authorisation
         """
         self.code = None
+        self.code_expires = None
         self.active = False
-        self.save(update_fields=["code", "active"])
+        self.save(update_fields=["code", "code_expires", "active"])
+        Account.forget_manage(self.user_id, self.owner_id)
 
     @staticmethod
     def flatten_scopes(scope_ids):
@@ -165,17 +421,10 @@ class Auth(models.Model):
         Take list of scope ids and flatten includes
         into single set of implicit scope permissions
         """
+        closure = Scope.closure()
         pancake = set()
-        queue = set(scope_ids)
-        while queue:
-            sid = queue.pop()
-            if sid not in pancake:
-                try:
-                    scope = Scope.objects.get(pk=sid)
-                    pancake.add(sid)
-                    queue.update(scope.includes.values_list("id", flat=True))
-                except Scope.DoesNotExist:
-                    pass
+        for sid in scope_ids:
+            pancake.update(closure.get(sid, ()))
         return pancake
 
 
@@ -189,10 +438,304 @@ class Trip(models.Model):
     :param date_updated: timestamp of last edit made
     """
 
-    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="trips")
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="trips", db_index=False
+    )
     date_created = models.DateField(auto_now_add=True)
     length_time = models.PositiveIntegerField(validators=[MinValueValidator(0)])
     length_distance = models.PositiveIntegerField(
         default=0, validators=[MinValueValidator(0)]
     )
-    date_updated = models.DateField(auto_now=True)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    # fields trip rollups are computed from
+    ROLLUP_FIELDS = ("account_id", "date_created", "length_time", "length_distance")
+    # copy of the trip as last read or saved, see api.signals.record_trip
+    recorded = None
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["account", "date_created"], name="api_trip_account_created_idx"
+            ),
+            models.Index(
+                fields=["account", "date_updated"], name="api_trip_account_updated_idx"
+            ),
+            models.Index(
+                fields=["account", "length_distance"],
+                name="api_trip_account_distance_idx",
+            ),
+            models.Index(
+                fields=["account", "length_time"], name="api_trip_account_time_idx"
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        trip = super().from_db(db, field_names, values)
+        if all(field in trip.__dict__ for field in cls.ROLLUP_FIELDS):
+            trip.recorded = trip.snapshot()
+        return trip
+
+    def snapshot(self):
+        """
+        Detached copy of current values to record trip totals from
+        """
+        trip = copy(self)
+        trip.recorded = None
+        return trip
+
+
+class TripRollup(models.Model):
+    """
+    Trip totals of an account over a day or week
+    Maintained by trip save and delete signals, bulk creates and queryset
+    updates skip signals so call TripRollup.record or rebuild for them
+    :param account: user account
+    :param period: length of period, day or week
+    :param date: first day of the period
+    :param trips: number of trips in period
+    :param length_time: total time of trips in seconds
+    :param length_distance: total distance of trips in metres
+    """
+
+    PERIODS = (Periods.DAY, Periods.WEEK)
+
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="rollups", db_index=False
+    )
+    period = models.CharField(
+        max_length=4, choices=[(period, period) for period in PERIODS]
+    )
+    date = models.DateField()
+    trips = models.IntegerField(default=0)
+    length_time = models.BigIntegerField(default=0)
+    length_distance = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "period", "date"], name="api_triprollup_unique"
+            )
+        ]
+
+    @staticmethod
+    def period_start(period, date):
+        """
+        First day of period containing date, weeks start on monday
+        """
+        if period == Periods.WEEK:
+            return date - timedelta(days=date.weekday())
+        return date
+
+    @classmethod
+    def record(cls, added=(), removed=()):
+        """
+        Apply trips added and removed to the rollups in one transaction
+        :param added: trips whose values are added
+        :param removed: trips whose values are removed
+        """
+        deltas = {}
+        for sign, trips in ((1, added), (-1, removed)):
+            for trip in trips:
+                for period in cls.PERIODS:
+                    key = (
+                        trip.account_id,
+                        period,
+                        cls.period_start(period, trip.date_created),
+                    )
+                    delta = deltas.setdefault(key, [0, 0, 0])
+                    delta[0] += sign
+                    delta[1] += sign * trip.length_time
+                    delta[2] += sign * trip.length_distance
+        with transaction.atomic():
+            for key, delta in deltas.items():
+                if any(delta):
+                    cls._apply(key, *delta)
+            if removed:
+                keys = (
+                    Q(account_id=account_id, period=period, date=date)
+                    for account_id, period, date in deltas
+                )
+                cls.objects.filter(reduce(or_, keys), trips__lte=0).delete()
+
+    @classmethod
+    def _apply(cls, key, trips, length_time, length_distance):
+        """
+        Add deltas to the rollup under key, creating it if missing
+        """
+        account_id, period, date = key
+        rollup = cls.objects.filter(account_id=account_id, period=period, date=date)
+        values = {
+            "trips": F("trips") + trips,
+            "length_time": F("length_time") + length_time,
+            "length_distance": F("length_distance") + length_distance,
+        }
+        if rollup.update(**values):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    account_id=account_id,
+                    period=period,
+                    date=date,
+                    trips=trips,
+                    length_time=length_time,
+                    length_distance=length_distance,
+                )
+        except IntegrityError:
+            # created concurrently since update
+            rollup.update(**values)
+
+    @classmethod
+    def rebuild(cls, account_ids=None):
+        """
+        Recompute rollups from trips
+        :param account_ids: accounts to rebuild, all accounts if None
+        :returns int: number of rollups created
+        """
+        trips = Trip.objects.order_by()
+        rollups = cls.objects.all()
+        if account_ids is not None:
+            trips = trips.filter(account_id__in=account_ids)
+            rollups = rollups.filter(account_id__in=account_ids)
+        truncs = {
+            Periods.DAY: F("date_created"),
+            Periods.WEEK: TruncWeek("date_created"),
+        }
+        with transaction.atomic():
+            rollups.delete()
+            created = []
+            for period, trunc in truncs.items():
+                totals = (
+                    trips.annotate(period_date=trunc)
+                    .values("account_id", "period_date")
+                    .annotate(
+                        total_trips=Count("id"),
+                        total_time=Sum("length_time"),
+                        total_distance=Sum("length_distance"),
+                    )
+                )
+                created.extend(
+                    cls(
+                        account_id=row["account_id"],
+                        period=period,
+                        date=row["period_date"],
+                        trips=row["total_trips"],
+                        length_time=row["total_time"],
+                        length_distance=row["total_distance"],
+                    )
+                    for row in totals.iterator()
+                )
+            return len(cls.objects.bulk_create(created, batch_size=500))
+
+
+class TripDeletion(models.Model):
+    """
+    Record of a deleted trip kept for clients syncing changes
+    :param account: user account the trip belonged to
+    :param trip_id: id the deleted trip had
+    :param date_deleted: timestamp of deletion
+    """
+
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="deletions", db_index=False
+    )
+    trip_id = models.IntegerField()
+    date_deleted = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["account", "date_deleted"], name="api_tripdel_account_idx"
+            )
+        ]
+
+    @classmethod
+    def record(cls, trips):
+        """
+        Log deletion of trips
+        :param trips: trips that were deleted
+        """
+        cls.objects.bulk_create(
+            cls(account_id=trip.account_id, trip_id=trip.id) for trip in trips
+        )
+
+
+class Mail(models.Model):
+    """
+    Outbound mail waiting to be sent by the mail worker
+    :param sender: email to send from
+    :param recievers: comma separated emails to send to
+    :param message: full rendered message
+    :param attempts: number of failed attempts at sending
+    :param next_attempt: timestamp mail is due to be sent, None once done
+    :param date_sent: timestamp mail was sent, None if not sent
+    :param error: last error sending mail
+    """
+
+    sender = models.TextField()
+    recievers = models.TextField()
+    message = models.TextField()
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(null=True, default=timezone.now)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_sent = models.DateTimeField(null=True)
+    error = models.TextField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["next_attempt"], name="api_mail_next_idx")]
+
+    @classmethod
+    def queue(cls, sender, recievers, subject, tmpl_file, tmpl_data):
+        """
+        Render mail from template and add it to the outbox
+        Takes the same arguments as utils.render_mail
+        """
+        return cls.objects.create(
+            sender=sender,
+            recievers=", ".join(recievers),
+            message=utils.render_mail(sender, recievers, subject, tmpl_file, tmpl_data),
+        )
+
+    @classmethod
+    def claim_due(cls, limit):
+        """
+        Reserve mails that are due for sending
+        Reserved mails are not due again until the lease expires
+        :param limit: maximum number of mails to claim
+        """
+        now = timezone.now()
+        lease = now + timedelta(seconds=Limits.MAIL_LEASE)
+        claimed = []
+        due = cls.objects.filter(next_attempt__lte=now).order_by("next_attempt")
+        for mail in due[:limit]:
+            if cls.objects.filter(pk=mail.pk, next_attempt=mail.next_attempt).update(
+                next_attempt=lease
+            ):
+                mail.next_attempt = lease
+                claimed.append(mail)
+        return claimed
+
+    def send(self, connection):
+        """
+        Send mail over connection recording the outcome
+        :param connection: open utils.MailConnection
+        :returns bool: True if mail was sent
+        """
+        try:
+            connection.send(self.sender, self.recievers.split(", "), self.message)
+        except (smtplib.SMTPException, OSError) as exc:
+            connection.close()
+            self.attempts += 1
+            self.error = str(exc)
+            self.next_attempt = None
+            if self.attempts < Limits.MAIL_ATTEMPTS:
+                backoff = Limits.MAIL_BACKOFF * 2 ** (self.attempts - 1)
+                self.next_attempt = timezone.now() + timedelta(seconds=backoff)
+            self.save(update_fields=["attempts", "error", "next_attempt"])
+            return False
+        self.next_attempt = None
+        self.date_sent = timezone.now()
+        self.save(update_fields=["next_attempt", "date_sent"])
+        return True
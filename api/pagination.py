@@ -0,0 +1,142 @@
+"""
+Api pagination styles
+"""
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as DecodeError
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Limit offset pagination with a keyset cursor mode
+    Cursor mode is used when requested with `?pagination=cursor` or
+    when a cursor is supplied, it pages forward through the ordering
+    keys without counting or scanning skipped rows
+    Ordered querysets are paged through their own ordering instead,
+    which must end with a unique field
+
+    http://api.example.org/trips?pagination=cursor&limit=100
+    http://api.example.org/trips?cursor=WyIyMDE4LTA1LTAxIiwgNDJd&limit=100
+    """
+
+    mode_query_param = "pagination"
+    cursor_mode = "cursor"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    # unique combination of fields to page through in ascending order
+    ordering = ("id",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.request = request
+        if queryset.query.order_by:
+            self.ordering = tuple(queryset.query.order_by)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        try:
+            if position is not None:
+                queryset = queryset.filter(self.after(position))
+            results = list(queryset[: self.limit + 1])
+        except (ValidationError, ValueError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+        self.has_next = len(results) > self.limit
+        self.page = results[: self.limit]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        fields = [field.lstrip("-") for field in self.ordering]
+        if isinstance(last, dict):
+            position = [last[field] for field in fields]
+        else:
+            position = [getattr(last, field) for field in fields]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(position)
+        )
+
+    def after(self, position):
+        """
+        Filter for rows ordered after position
+        :param position: list of values for each ordering field
+        """
+        fields = [field.lstrip("-") for field in self.ordering]
+        past = ["__lt" if field[0] == "-" else "__gt" for field in self.ordering]
+        after = reduce(
+            or_,
+            (
+                Q(
+                    **dict(zip(fields[:i], position[:i])),
+                    **{fields[i] + past[i]: position[i]}
+                )
+                for i in range(len(fields))
+            ),
+        )
+        # redundant bound on leading key lets the index range scan start there
+        return Q(**{fields[0] + past[0] + "e": position[0]}) & after
+
+    @staticmethod
+    def encode_cursor(position):
+        """
+        Encode position into opaque cursor string
+        """
+        data = json.dumps(position, cls=DjangoJSONEncoder)
+        return b64encode(data.encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, request):
+        """
+        Decode position from request cursor
+        :raises NotFound: if cursor is not valid
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(b64decode(encoded.encode("ascii"), validate=True))
+        except (DecodeError, UnicodeError, ValueError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+class TripPagination(KeysetPagination):
+    """
+    Trip pagination with cursor ordered by creation
+    """
+
+    ordering = ("date_created", "id")
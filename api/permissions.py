@@ -1,6 +1,7 @@
 """
 Api permissions module
 """
+from rest_framework.filters import BaseFilterBackend
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 from api import models, views
@@ -15,22 +16,57 @@ class JoggerPermissions(BasePermission):
         user = request.user
         if user.is_superuser:
             return True
-        if isinstance(view, (views.AccountViewSet, views.TripViewSet)):
+        if isinstance(view, views.AccountViewSet) and view.action == "create":
             return True
+        if isinstance(view, (views.AccountViewSet, views.TripViewSet)):
+            return user.is_authenticated
         return False
 
     def has_object_permission(self, request, view, obj):
         user = request.user
         if user.is_superuser:
             return True
+        managing = models.Account.get_managing(user.id)
         if isinstance(obj, models.Account):
             if user.id == obj.id:
                 return True
-            if user.id in obj.managers and request.method in SAFE_METHODS:
+            if obj.id in managing and request.method in SAFE_METHODS:
                 return True
         if isinstance(obj, models.Trip):
-            if user.id == obj.account.id:
+            if user.id == obj.account_id:
                 return True
-            if user.id in obj.account.managers:
+            if obj.account_id in managing:
                 return True
         return False
+
+
+class JoggerPermissionsFilter(BaseFilterBackend):
+    """
+    Limit querysets to objects JoggerPermissions allows access to
+    Accounts and models with an account are filtered by account id
+    """
+
+    @staticmethod
+    def get_account_ids(request):
+        """
+        Ids of accounts whose objects the user may read
+        :returns set: None if user may read every account
+        """
+        user = request.user
+        if user.is_superuser:
+            return None
+        if not user.is_authenticated:
+            return set()
+        return {user.id} | models.Account.get_managing(user.id)
+
+    def filter_queryset(self, request, queryset, view):
+        account_ids = self.get_account_ids(request)
+        if account_ids is None:
+            return queryset
+        if queryset.model is models.Account:
+            if request.method in SAFE_METHODS:
+                return queryset.filter(pk__in=account_ids)
+            return queryset.filter(pk=request.user.id)
+        if any(field.name == "account" for field in queryset.model._meta.fields):
+            return queryset.filter(account_id__in=account_ids)
+        return queryset.none()
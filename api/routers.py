@@ -0,0 +1,59 @@
+"""
+Api database routers
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+_PRIMARY_ONLY = ContextVar("primary_only", default=True)
+
+
+@contextmanager
+def request_scope(method):
+    """
+    Context within which reads may be sent to replicas,
+    entered once per request by ReadReplicaMiddleware
+    :param str method: http method of request
+    """
+    token = _PRIMARY_ONLY.set(method not in SAFE_METHODS)
+    try:
+        yield
+    finally:
+        _PRIMARY_ONLY.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads of safe requests to a replica in DATABASE_REPLICAS
+    Writes and every read after a write in the same request use the primary
+    """
+
+    def db_for_read(self, _model, **_hints):
+        """
+        Random replica unless the request is primary only or in a transaction
+        """
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or _PRIMARY_ONLY.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, _model, **_hints):
+        """
+        Primary, later reads in the request follow it to see the write
+        """
+        _PRIMARY_ONLY.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, _obj1, _obj2, **_hints):
+        """
+        Allow relations across aliases as replicas hold copies of the primary
+        """
+        return True
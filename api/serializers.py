@@ -1,9 +1,11 @@
 """
 Define model serializers here
 """
+from django.db import transaction
 from rest_framework import serializers
 
 from api import models
+from api.constants import Limits, Periods, PermissionCodes
 
 
 class ScopeSerializer(serializers.ModelSerializer):
@@ -15,7 +17,12 @@ class ScopeSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def get_includes(obj):
-        return [ScopeSerializer(scope).data for scope in obj.includes]
+        included = PermissionCodes.graph.get(obj.codename, [])
+        return [
+            ScopeSerializer(scope).data
+            for codename, scope in models.Scope.registry().items()
+            if codename in included
+        ]
 
     class Meta:
         model = models.Scope
@@ -31,12 +38,12 @@ class AuthSerializer(serializers.ModelSerializer):
         model = models.Auth
         fields = (
             "id",
-            "code",
             "user",
             "owner",
             "scopes",
             "granted",
             "active",
+            "code_expires",
             "date_created",
         )
 
@@ -51,6 +58,25 @@ class AccountSerializer(serializers.ModelSerializer):
         fields = ("id", "username", "email", "first_name", "last_name")
 
 
+class TripListSerializer(serializers.ListSerializer):
+    """
+    Trip sessions serializer inserting in batches
+    """
+
+    def create(self, validated_data):
+        request = self.context["request"]
+        trips = [
+            models.Trip(**dict(attrs, account_id=request.user.id))
+            for attrs in validated_data
+        ]
+        with transaction.atomic():
+            trips = models.Trip.objects.bulk_create(
+                trips, batch_size=Limits.TRIP_BULK_BATCH
+            )
+            models.TripRollup.record(added=trips)
+        return trips
+
+
 class TripSerializer(serializers.ModelSerializer):
     """
     Trip session serializer
@@ -58,14 +84,136 @@ class TripSerializer(serializers.ModelSerializer):
 
     owner = serializers.ReadOnlyField(source="account_id")
 
+    # trip columns read by the values list path, in field order
+    VALUES = ("id", "account_id", "date_created", "length_distance", "length_time")
+
+    @staticmethod
+    def represent_values(rows):
+        """
+        Represent trip value rows without building serializer fields
+        Output is identical to serializing the trips with many=True
+        :param rows: dicts of trip VALUES
+        """
+        date_field = serializers.DateField()
+        return [
+            {
+                "id": row["id"],
+                "owner": row["account_id"],
+                "date_created": date_field.to_representation(row["date_created"]),
+                "length_distance": row["length_distance"],
+                "length_time": row["length_time"],
+            }
+            for row in rows
+        ]
+
     def create(self, validated_data):
         request = self.context["request"]
         # for k in ['account', 'account_id']:
         #     if k in validated_data:
         #         del validated_data[k]
         validated_data["account_id"] = request.user.id
-        return models.Trip.objects.create(**validated_data)
+        # rollups are recorded by the trip save signal
+        with transaction.atomic():
+            return models.Trip.objects.create(**validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            return super().update(instance, validated_data)
 
     class Meta:
         model = models.Trip
         fields = ("id", "owner", "date_created", "length_distance", "length_time")
+        list_serializer_class = TripListSerializer
+
+
+class TripStatsFilterSerializer(serializers.Serializer):
+    """
+    Trip statistics query parameters serializer
+    """
+
+    period = serializers.ChoiceField(
+        choices=[Periods.WEEK, Periods.MONTH], default=Periods.WEEK
+    )
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must not be after end")
+        return attrs
+
+
+class TripFilterSerializer(serializers.Serializer):
+    """
+    Trip list query parameters serializer
+    :property min_pace: fastest pace in seconds per kilometre
+    :property max_pace: slowest pace in seconds per kilometre
+    :property ordering: indexed field to order by, descending if prefixed with -
+    """
+
+    # fields trips can be ordered by, each indexed with the trip account
+    ORDERING = ("date_created", "length_distance", "length_time")
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    min_distance = serializers.IntegerField(min_value=0, required=False)
+    max_distance = serializers.IntegerField(min_value=0, required=False)
+    min_time = serializers.IntegerField(min_value=0, required=False)
+    max_time = serializers.IntegerField(min_value=0, required=False)
+    min_pace = serializers.FloatField(min_value=0, required=False)
+    max_pace = serializers.FloatField(min_value=0, required=False)
+    ordering = serializers.ChoiceField(
+        choices=[key for field in ORDERING for key in (field, "-" + field)],
+        required=False,
+    )
+
+    def validate(self, attrs):
+        for low, high in [
+            ("start", "end"),
+            ("min_distance", "max_distance"),
+            ("min_time", "max_time"),
+            ("min_pace", "max_pace"),
+        ]:
+            if low in attrs and high in attrs and attrs[low] > attrs[high]:
+                raise serializers.ValidationError(
+                    "{} must not be after {}".format(low, high)
+                )
+        return attrs
+
+
+class TripSyncFilterSerializer(serializers.Serializer):
+    """
+    Trip sync query parameters serializer
+    :property since: watermark returned by the previous sync
+    """
+
+    since = serializers.DateTimeField()
+
+
+class TripSyncSerializer(serializers.Serializer):
+    """
+    Trip changes since a watermark serializer
+    :property watermark: since value for the next sync
+    :property trips: trips created or updated after the previous watermark
+    :property deleted: ids of trips deleted after the previous watermark
+    :property has_more: more changes follow, sync again from watermark
+    """
+
+    watermark = serializers.DateTimeField()
+    trips = TripSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.IntegerField())
+    has_more = serializers.BooleanField()
+
+
+class TripStatsSerializer(serializers.Serializer):
+    """
+    Trip totals over a reporting period serializer
+    :property period: first day of the period
+    :property average_speed: total distance over total time in metres per second
+    """
+
+    period = serializers.DateField(source="report_period")
+    trips = serializers.IntegerField(source="total_trips")
+    length_distance = serializers.IntegerField(source="total_distance")
+    length_time = serializers.IntegerField(source="total_time")
+    average_speed = serializers.FloatField(allow_null=True)
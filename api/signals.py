@@ -0,0 +1,82 @@
+"""
+Api model signal handlers
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api import cache, models
+
+
+@receiver(post_save, sender=models.Scope)
+@receiver(post_delete, sender=models.Scope)
+def invalidate_scopes(**_):
+    """
+    Drop cached scope data when any scope is written
+    """
+    models.Scope.invalidate()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=models.Account)
+@receiver(post_delete, sender=models.Account)
+def invalidate_principal(instance, **_):
+    """
+    Drop cached authenticated account when it or its user is written
+    Other processes keep their copy until PRINCIPAL_CACHE_TTL expires
+    """
+    cache.principals.delete(instance.pk)
+
+
+@receiver(pre_save, sender=models.Trip)
+def remember_trip(instance, **_):
+    """
+    Load stored values of a trip saved without being read, e.g. by loaddata
+    """
+    if instance.pk is not None and instance.recorded is None:
+        instance.recorded = models.Trip.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=models.Trip)
+def record_trip(instance, **_):
+    """
+    Move trip totals from the stored values of a trip to its saved values
+    """
+    removed = [] if instance.recorded is None else [instance.recorded]
+    models.TripRollup.record(added=[instance], removed=removed)
+    instance.recorded = instance.snapshot()
+
+
+@receiver(post_delete, sender=models.Trip)
+def record_trip_delete(instance, origin=None, **_):
+    """
+    Remove deleted trip from trip totals
+    Skipped when its account is deleted as its rollups are deleted with it
+    """
+    if isinstance(origin, models.Account):
+        return
+    models.TripRollup.record(removed=[instance.recorded or instance])
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **_):
+    """
+    Drop cached token when it is revoked
+    """
+    cache.tokens.delete(instance.key)
+
+
+@receiver(connection_created)
+def tune_sqlite(connection, **_):
+    """
+    Apply configured pragmas to every new sqlite connection
+    """
+    if connection.vendor != "sqlite" or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute("PRAGMA {} = {}".format(pragma, value))
@@ -28,6 +28,10 @@ class AccountMixin(FixturesMixin):
 
     def setUp(self):
         super(AccountMixin, self).setUp()
+        # fresh instances so requests cannot leak changes between tests
+        self.superuser = Account.objects.get(pk=1)
+        self.user = Account.objects.get(pk=3)
+        self.mgr = Account.objects.get(pk=2)
         manage_scope = Scope.objects.get(codename=PermissionCodes.Account.MANAGE)
         for i in range(3):
             auth_obj = Auth.objects.create(user=self.user, owner=self.mgr)
@@ -0,0 +1,87 @@
+"""
+Local smtp server stand in for mail tests
+"""
+import socketserver
+import threading
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal smtp session recording received messages on the server
+    """
+
+    def reply(self, line):
+        """
+        Write reply line to client
+        """
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost stand in")
+        envelope = {"recievers": []}
+        while True:
+            line = self.rfile.readline().decode("utf-8")
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "MAIL":
+                envelope = {"sender": line[10:].strip(" <>\r\n"), "recievers": []}
+                self.reply("250 OK")
+            elif command == "RCPT":
+                envelope["recievers"].append(line[8:].strip(" <>\r\n"))
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in iter(self.rfile.readline, b".\r\n"):
+                    data.append(data_line.decode("utf-8"))
+                envelope["message"] = "".join(data)
+                self.server.messages.append(envelope)
+                self.reply("250 OK")
+                if self.server.drop_after_message:
+                    return
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class MailServer(socketserver.ThreadingTCPServer):
+    """
+    Threaded smtp server on a free localhost port
+    :property messages: envelopes received with sender, recievers and message
+    :property connections: number of client connections accepted
+    :property drop_after_message: close connection after each message
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("localhost", 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.drop_after_message = False
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        """
+        Port server is listening on
+        """
+        return self.server_address[1]
+
+    def verify_request(self, request, client_address):
+        self.connections += 1
+        return True
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+        self.server_close()
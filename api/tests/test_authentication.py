@@ -0,0 +1,120 @@
+"""
+Test authentication module
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache as backend
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api import cache
+from api.authentication import get_principal
+from api.models import Account
+from api.tests import AccountMixin
+
+
+class AccountTokenAuthenticationTest(AccountMixin, APITestCase):
+    """
+    Test bearer token authentication
+    """
+
+    def setUp(self):
+        super().setUp()
+        backend.clear()
+        cache.tokens.clear()
+        cache.principals.clear()
+        password = get_random_string(16)
+        self.user.set_password(password)
+        self.user.save()
+        url = reverse("auth-user")
+        response = self.client.post(
+            url, data={"email": self.user.email, "password": password}
+        )
+        self.token = json.loads(response.content)["token"]
+
+    def test_token_issued(self):
+        """
+        Test sign in issues the same reusable token
+        """
+        self.assertTrue(self.token)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("account-profile"))
+        self.assertNotIn("token", json.loads(response.content))
+
+    def test_token_access(self):
+        """
+        Test bearer token authenticates with cached account
+        """
+        url = reverse("account-profile")
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        response = self.client.get(url)
+        self.assertContains(response, self.user.email)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, self.user.email)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalid-token")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_token_account_changed(self):
+        """
+        Test cached account is refreshed when account is updated
+        """
+        url = reverse("account-profile")
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        self.client.get(url)
+        data = {"email": "changed-email@example.com"}
+        response = self.client.patch(url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertContains(response, data["email"])
+        self.user.refresh_from_db()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_token_stale_principal_update(self):
+        """
+        Test profile update does not write back stale cached columns
+        """
+        url = reverse("account-profile")
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        self.client.get(url)
+        # changed without signals as if by another process
+        password = get_random_string(16)
+        self.user.set_password(password)
+        User.objects.filter(pk=self.user.id).update(password=self.user.password)
+        response = self.client.patch(url, data={"first_name": "X"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        account = Account.objects.get(pk=self.user.id)
+        self.assertEqual(account.first_name, "X")
+        self.assertTrue(account.check_password(password))
+
+    def test_token_user_changed(self):
+        """
+        Test cached account is refreshed when its user is updated
+        """
+        url = reverse("account-profile")
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        self.client.get(url)
+        user = User.objects.get(pk=self.user.id)
+        user.is_active = False
+        user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_principal_granted(self):
+        """
+        Test principal includes scopes granted to account
+        """
+        principal = get_principal(self.mgr.id)
+        self.assertIn(Account.get_manage_scope().id, principal.granted)
+        self.assertEqual(get_principal(self.user.id).granted, set())
+        self.assertIsNot(get_principal(self.mgr.id), get_principal(self.mgr.id))
+        self.assertTrue(get_principal(self.mgr.id).is_cached_principal)
+        self.assertFalse(Account.objects.get(pk=self.mgr.id).is_cached_principal)
+        self.assertIsNone(get_principal(0))
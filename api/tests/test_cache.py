@@ -0,0 +1,140 @@
+"""
+Test cache module
+"""
+from unittest.mock import MagicMock, patch
+from django.test import SimpleTestCase
+
+from api.cache import LRUCache, Snapshot, forget, memoize, request_scope
+from api.middleware import RequestCacheMiddleware
+
+
+class RequestCacheTest(SimpleTestCase):
+    """
+    Test request scoped memoization
+    """
+
+    def test_memoize_outside_scope(self):
+        """
+        Test values are always recomputed outside a request
+        """
+        func = MagicMock(return_value=1)
+        self.assertEqual(memoize("key", func), 1)
+        self.assertEqual(memoize("key", func), 1)
+        self.assertEqual(func.call_count, 2)
+        forget("key")
+
+    def test_memoize_in_scope(self):
+        """
+        Test values are computed once per request until forgotten
+        """
+        func = MagicMock(return_value=1)
+        with request_scope():
+            memoize("key", func)
+            memoize("key", func)
+            self.assertEqual(func.call_count, 1)
+            forget("key", "missing")
+            memoize("key", func)
+            self.assertEqual(func.call_count, 2)
+        with request_scope():
+            memoize("key", func)
+            self.assertEqual(func.call_count, 3)
+
+    def test_middleware_scope(self):
+        """
+        Test middleware shares memoized values within a request
+        """
+        func = MagicMock(return_value=1)
+
+        def get_response(_):
+            memoize("key", func)
+            return memoize("key", func)
+
+        middleware = RequestCacheMiddleware(get_response)
+        self.assertEqual(middleware(MagicMock()), 1)
+        self.assertEqual(func.call_count, 1)
+        memoize("key", func)
+        self.assertEqual(func.call_count, 2)
+
+
+class LRUCacheTest(SimpleTestCase):
+    """
+    Test in process least recently used cache
+    """
+
+    @patch("api.cache.backend")
+    def test_lru_eviction(self, backend):
+        """
+        Test least recently used entries are evicted past maxsize
+        """
+        backend.get.return_value = None
+        lru = LRUCache("test", 2, 60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        self.assertEqual(lru.get("a"), 1)
+        lru.set("c", 3)
+        self.assertEqual(list(lru.entries), ["a", "c"])
+        self.assertIsNone(lru.get("b"))
+        backend.get.assert_called_with("test:b")
+        lru.delete("a")
+        backend.delete.assert_called_with("test:a")
+        self.assertEqual(lru.get("a", 0), 0)
+
+    @patch("api.cache.time")
+    @patch("api.cache.backend")
+    def test_lru_expiry(self, backend, mock_time):
+        """
+        Test expired entries are read through the cache backend
+        """
+        mock_time.monotonic.return_value = 0
+        backend.get.return_value = 2
+        lru = LRUCache("test", 2, 60)
+        lru.set("a", 1)
+        backend.set.assert_called_with("test:a", 1, 60)
+        self.assertEqual(lru.get("a"), 1)
+        mock_time.monotonic.return_value = 61
+        self.assertEqual(lru.get("a"), 2)
+
+
+class SnapshotTest(SimpleTestCase):
+    """
+    Test versioned shared snapshot
+    """
+
+    def test_snapshot_built_once_per_version(self):
+        """
+        Test value is built once until invalidated
+        """
+        build = MagicMock(side_effect=[1, 2])
+        snapshot = Snapshot("test_snapshot")
+        self.assertEqual(snapshot.get(build), 1)
+        self.assertEqual(snapshot.get(build), 1)
+        self.assertEqual(build.call_count, 1)
+        snapshot.invalidate()
+        self.assertEqual(snapshot.get(build), 2)
+        self.assertEqual(build.call_count, 2)
+
+    def test_snapshot_shared_between_processes(self):
+        """
+        Test value is read through the cache backend and invalidated everywhere
+        """
+        build = MagicMock(side_effect=[1, 2])
+        snapshot = Snapshot("test_shared")
+        other = Snapshot("test_shared")
+        self.assertEqual(snapshot.get(build), 1)
+        self.assertEqual(other.get(build), 1)
+        self.assertEqual(build.call_count, 1)
+        other.invalidate()
+        self.assertEqual(snapshot.get(build), 2)
+
+    def test_snapshot_local_values_follow_version(self):
+        """
+        Test process values are rebuilt when another process invalidates
+        """
+        build = MagicMock(side_effect=[1, 2])
+        snapshot = Snapshot("test_local")
+        other = Snapshot("test_local")
+        self.assertEqual(snapshot.local("name", build), 1)
+        self.assertEqual(snapshot.local("name", build), 1)
+        other.invalidate()
+        self.assertEqual(snapshot.local("name", build), 2)
+        self.assertEqual(build.call_count, 2)
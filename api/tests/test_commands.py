@@ -0,0 +1,94 @@
+"""
+Test api management commands
+"""
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api.constants import Periods
+from api.models import Auth, Trip, TripRollup
+from api.tests import AccountMixin
+
+
+class RebuildTripRollupsTest(AccountMixin, TestCase):
+    """
+    Test rebuilding trip rollups
+    """
+
+    def test_rebuild_trip_rollups(self):
+        """
+        Test rollups are recomputed from trips
+        """
+        TripRollup.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_trip_rollups", stdout=out)
+        self.assertIn("Created", out.getvalue())
+        for period in TripRollup.PERIODS:
+            rollups = TripRollup.objects.filter(period=period)
+            self.assertEqual(sum(r.trips for r in rollups), Trip.objects.count())
+            self.assertEqual(
+                sum(r.length_distance for r in rollups),
+                sum(t.length_distance for t in Trip.objects.all()),
+            )
+        for rollup in TripRollup.objects.filter(period=Periods.WEEK):
+            self.assertEqual(rollup.date.weekday(), 0)
+
+    def test_rebuild_trip_rollups_account(self):
+        """
+        Test rollups are recomputed only for selected accounts
+        """
+        TripRollup.objects.all().delete()
+        call_command("rebuild_trip_rollups", account=[self.user.id], stdout=StringIO())
+        self.assertTrue(TripRollup.objects.filter(account=self.user).exists())
+        self.assertFalse(TripRollup.objects.exclude(account=self.user).exists())
+
+
+class PurgeAuthCodesTest(AccountMixin, TestCase):
+    """
+    Test purging expired authorisation codes
+    """
+
+    def test_purge_auth_codes(self):
+        """
+        Test only expired pending authorisations are deleted
+        """
+        expired = Auth(user_id=3, owner_id=2)
+        expired.set_code("expired")
+        expired.save()
+        Auth.objects.filter(pk=expired.pk).update(code_expires=timezone.now())
+        pending = Auth(user_id=3, owner_id=1)
+        pending.set_code("pending")
+        pending.save()
+        out = StringIO()
+        call_command("purge_auth_codes", stdout=out)
+        self.assertIn("Deleted 1", out.getvalue())
+        self.assertFalse(Auth.objects.filter(pk=expired.pk).exists())
+        self.assertTrue(Auth.objects.filter(pk=pending.pk).exists())
+
+
+class PruneAuthsTest(AccountMixin, TestCase):
+    """
+    Test pruning dead authorisations
+    """
+
+    def test_prune_auths(self):
+        """
+        Test dead authorisations past retention are deleted in chunks
+        """
+        Auth.objects.bulk_create(Auth(user_id=3, owner_id=1) for _ in range(5))
+        pending = Auth(user_id=3, owner_id=1)
+        pending.set_code("pending")
+        pending.save()
+        live = Auth.objects.filter(active=True).count()
+        dead = Auth.objects.filter(active=False, code__isnull=True).count()
+        out = StringIO()
+        call_command("prune_auths", days=1, stdout=out)
+        self.assertIn("Deleted 0", out.getvalue())
+        Auth.objects.update(date_created=timezone.now().date() - timedelta(days=2))
+        out = StringIO()
+        call_command("prune_auths", days=1, chunk=2, stdout=out)
+        self.assertIn("Deleted {}".format(dead), out.getvalue())
+        self.assertTrue(Auth.objects.filter(pk=pending.pk).exists())
+        self.assertEqual(Auth.objects.filter(active=True).count(), live)
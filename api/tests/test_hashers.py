@@ -0,0 +1,66 @@
+"""
+Test hashers module
+"""
+from unittest.mock import patch
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.test import TestCase
+from rest_framework.exceptions import APIException
+
+from api import hashers
+from api.tests import AccountMixin
+
+
+class HMACSHA256PasswordHasherTest(TestCase):
+    """
+    Test keyed code hasher
+    """
+
+    def test_encode_verify(self):
+        """
+        Test encoded codes verify and are salted
+        """
+        hasher = hashers.HMACSHA256PasswordHasher()
+        encoded = make_password("code", hasher=hasher.algorithm)
+        self.assertIsInstance(identify_hasher(encoded), type(hasher))
+        self.assertTrue(hasher.verify("code", encoded))
+        self.assertFalse(hasher.verify("other", encoded))
+        self.assertNotEqual(encoded, make_password("code", hasher=hasher.algorithm))
+
+    def test_keyed_digest(self):
+        """
+        Test digest is deterministic and fixed length
+        """
+        self.assertEqual(hashers.keyed_digest("a"), hashers.keyed_digest("a"))
+        self.assertNotEqual(hashers.keyed_digest("a"), hashers.keyed_digest("b"))
+        self.assertEqual(len(hashers.keyed_digest("a" * 1000)), 64)
+
+
+class CheckAccountPasswordTest(AccountMixin, TestCase):
+    """
+    Test sign in password checks
+    """
+
+    def test_rehash_outdated(self):
+        """
+        Test password is rehashed when hasher iterations change
+        """
+        self.user.password = make_password("secret", hasher="pbkdf2_sha1")
+        self.user.save()
+        self.assertFalse(hashers.check_account_password(self.user, "wrong"))
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha1$"))
+        self.assertTrue(hashers.check_account_password(self.user, "secret"))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        with patch.object(hashers.PBKDF2PasswordHasher, "iterations", 1000):
+            self.assertTrue(hashers.check_account_password(self.user, "secret"))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+    def test_queue_full(self):
+        """
+        Test checks are refused when no slots are free
+        """
+        with patch.object(hashers._LOGIN_SLOTS, "acquire", return_value=False):
+            with self.assertRaises(APIException) as ctx:
+                hashers.check_account_password(self.user, "secret")
+        self.assertEqual(ctx.exception.status_code, 503)
@@ -0,0 +1,69 @@
+"""
+Test hot queries are served by indexes
+"""
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+
+from api.models import Account, Auth, Trip
+from api.tests import AccountMixin
+
+
+@skipUnless(connection.vendor == "sqlite", "query plans are sqlite specific")
+class QueryPlanTest(AccountMixin, TestCase):
+    """
+    Test query plans of hot access paths
+    """
+
+    def assert_uses_index(self, queryset, index_name):
+        """
+        Custom assert queryset is searched using named index
+        :param queryset: queryset to explain
+        :param index_name: name of index expected in plan
+        """
+        plan = queryset.explain()
+        self.assertIn("USING INDEX {}".format(index_name), plan)
+
+    def test_trip_list_plan(self):
+        """
+        Test trip listing by account uses account creation index
+        """
+        queryset = Trip.objects.filter(account_id__in={self.user.id}).order_by(
+            "date_created", "id"
+        )
+        self.assert_uses_index(queryset, "api_trip_account_created_idx")
+
+    def test_trip_filter_plan(self):
+        """
+        Test filtered and ordered trip listings use matching account indexes
+        """
+        trips = Trip.objects.filter(account_id__in={self.user.id})
+        queryset = trips.filter(length_distance__gte=10000).order_by(
+            "-length_distance", "-id"
+        )
+        self.assert_uses_index(queryset, "api_trip_account_distance_idx")
+        queryset = trips.filter(length_time__lte=600).order_by("length_time", "id")
+        self.assert_uses_index(queryset, "api_trip_account_time_idx")
+
+    def test_auth_managers_plan(self):
+        """
+        Test manager lookups use auth account indexes
+        """
+        queryset = Account.get_manage_auths().filter(user_id=self.user.id)
+        self.assert_uses_index(queryset, "api_auth_user_active_idx")
+        queryset = Account.get_manage_auths().filter(owner_id=self.mgr.id)
+        self.assert_uses_index(queryset, "api_auth_owner_active_idx")
+
+    def test_auth_code_plan(self):
+        """
+        Test auth code lookup uses unique code index
+        """
+        queryset = Auth.objects.filter(code="code", owner_id=self.mgr.id)
+        self.assert_uses_index(queryset, "sqlite_autoindex_api_auth_1")
+
+    def test_account_email_plan(self):
+        """
+        Test account lookup by email uses email index
+        """
+        queryset = Account.objects.filter(email=self.user.email)
+        self.assert_uses_index(queryset, "api_account_email_idx")
@@ -0,0 +1,102 @@
+"""
+Test mail outbox delivery
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api.constants import Limits, Templates
+from api.models import Mail
+from api.tests.mailserver import MailServer
+from api.utils import MailConnection
+
+
+class MailOutboxTest(TestCase):
+    """
+    Test queueing and sending mail against local smtp server
+    """
+
+    def queue(self, count=1):
+        """
+        Queue password reset complete mails
+        """
+        return [
+            Mail.queue(
+                sender="sender@example.com",
+                recievers=["user{}@example.com".format(i), "copy@example.com"],
+                subject="Account Password Changed",
+                tmpl_file=Templates.Email.RESET_COMPLETE,
+                tmpl_data={},
+            )
+            for i in range(count)
+        ]
+
+    def test_mail_queue(self):
+        """
+        Test queued mail is rendered and due
+        """
+        mail = self.queue()[0]
+        self.assertIn("Subject: Account Password Changed", mail.message)
+        self.assertEqual(mail.recievers, "user0@example.com, copy@example.com")
+        self.assertEqual(Mail.claim_due(10), [mail])
+        self.assertEqual(Mail.claim_due(10), [])
+
+    def test_mail_send_persistent(self):
+        """
+        Test mails are sent over one connection and reconnect when dropped
+        """
+        mails = self.queue(3)
+        with MailServer() as server, MailConnection(port=server.port) as conn:
+            for mail in Mail.claim_due(10):
+                self.assertTrue(mail.send(conn))
+            self.assertEqual(server.connections, 1)
+            server.drop_after_message = True
+            mail = self.queue()[0]
+            Mail.claim_due(10)[0].send(conn)
+            Mail.objects.filter(pk=mail.pk).update(next_attempt=timezone.now())
+            self.assertTrue(Mail.claim_due(10)[0].send(conn))
+            self.assertEqual(server.connections, 2)
+        self.assertEqual(len(server.messages), len(mails) + 2)
+        self.assertEqual(
+            server.messages[0]["recievers"], ["user0@example.com", "copy@example.com"]
+        )
+        self.assertFalse(Mail.objects.filter(date_sent__isnull=True).exists())
+
+    def test_mail_send_retry(self):
+        """
+        Test failed mails are retried with backoff until attempts run out
+        """
+        mail = self.queue()[0]
+        with MailServer() as server:
+            port = server.port
+        with MailConnection(port=port) as conn:
+            for attempt in range(1, Limits.MAIL_ATTEMPTS + 1):
+                Mail.objects.filter(pk=mail.pk).update(next_attempt=timezone.now())
+                mail = Mail.claim_due(10)[0]
+                self.assertFalse(mail.send(conn))
+                mail.refresh_from_db()
+                self.assertEqual(mail.attempts, attempt)
+                self.assertIsNotNone(mail.error)
+                if attempt < Limits.MAIL_ATTEMPTS:
+                    backoff = Limits.MAIL_BACKOFF * 2 ** (attempt - 1)
+                    self.assertGreater(
+                        mail.next_attempt,
+                        timezone.now() + timedelta(seconds=backoff - 5),
+                    )
+        self.assertIsNone(mail.next_attempt)
+        self.assertIsNone(mail.date_sent)
+
+    def test_send_mail_outbox_command(self):
+        """
+        Test command sends all due mail
+        """
+        self.queue(2)
+        with MailServer() as server:
+            with patch("api.utils.MAIL_PORT", server.port):
+                out = StringIO()
+                call_command("send_mail_outbox", once=True, stdout=out)
+        self.assertEqual(out.getvalue().count("Sent mail"), 2)
+        self.assertEqual(len(server.messages), 2)
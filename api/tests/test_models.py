@@ -1,9 +1,13 @@
 """
 Test api models
 """
+from django.core.cache import cache as backend
 from django.test import TestCase
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 
+from api import cache
+from api.cache import request_scope
 from api.constants import PermissionCodes
 from api.models import Scope, Permission, Auth, Account, Trip
 from api.tests import FixturesMixin, AccountMixin
@@ -23,6 +27,34 @@ class ScopeTest(FixturesMixin, TestCase):
             Scope.objects.first().description, Permission.objects.get(pk=scope.id).name
         )
 
+    def test_scope_registry(self):
+        """
+        Test scopes are looked up by codename without querying
+        """
+        codename = PermissionCodes.Account.MANAGE
+        scope = Scope.get_by_codename(codename)
+        self.assertEqual(scope, Scope.objects.get(codename=codename))
+        with self.assertNumQueries(0):
+            self.assertEqual(Account.get_manage_scope(), scope)
+        with self.assertRaises(Scope.DoesNotExist):
+            Scope.get_by_codename("missing_codename")
+
+    def test_scope_registry_refresh(self):
+        """
+        Test scope registry is refreshed when scopes are written
+        """
+        scope_id = Account.get_manage_scope().id
+        Account.get_manage_scope().delete(keep_parents=True)
+        with self.assertRaises(Scope.DoesNotExist):
+            Account.get_manage_scope()
+        Scope.create_all()
+        self.assertEqual(Account.get_manage_scope().id, scope_id)
+        registry = Scope.registry()
+        self.assertIs(Scope.registry(), registry)
+        # version moved by another process
+        backend.set(cache.scopes.version_key(), "other", None)
+        self.assertIsNot(Scope.registry(), registry)
+
 
 class AuthTest(AccountMixin, TestCase):
     """
@@ -52,6 +84,40 @@ class AuthTest(AccountMixin, TestCase):
         self.assertFalse(auth.active)
         self.assertIsNone(auth.code)
 
+    def test_auth_pending_code(self):
+        """
+        Test auth is found by plain code only until it expires
+        """
+        plain_code = get_random_string(128)
+        auth = Auth(user_id=3, owner_id=2)
+        auth.set_code(plain_code)
+        auth.save()
+        self.assertEqual(len(auth.code), 64)
+        self.assertNotEqual(auth.code, plain_code)
+        self.assertEqual(Auth.get_pending(plain_code).get(), auth)
+        self.assertFalse(Auth.get_pending(auth.code).exists())
+
+        Auth.objects.filter(pk=auth.pk).update(code_expires=timezone.now())
+        self.assertFalse(Auth.get_pending(plain_code).exists())
+        self.assertEqual(Auth.purge_expired(), 1)
+        self.assertFalse(Auth.objects.filter(pk=auth.pk).exists())
+
+    def test_auth_compact(self):
+        """
+        Test only the latest single scope authorisation is kept
+        """
+        scope = Account.get_manage_scope()
+        self.assertIsNone(Auth.compact(3, 1, scope))
+        auths = [Auth.objects.create(user_id=3, owner_id=1) for _ in range(3)]
+        for auth in auths:
+            auth.scopes.set({scope})
+        wider = Auth.objects.create(user_id=3, owner_id=1)
+        wider.scopes.set(Scope.objects.all())
+        self.assertEqual(Auth.compact(3, 1, scope), auths[-1])
+        self.assertEqual(
+            set(Auth.objects.filter(user_id=3, owner_id=1)), {auths[-1], wider}
+        )
+
     def test_scopes_flatten_invalid(self):
         """
         Test auth scope flatten function
@@ -72,6 +138,27 @@ class AuthTest(AccountMixin, TestCase):
         pancake = Auth.flatten_scopes([0, 420] + implicit_ids)
         self.assertSetEqual(pancake, explicit_ids)
 
+    def test_scopes_flatten_cached(self):
+        """
+        Test flattening scopes does not query once closure is built
+        """
+        scope_ids = list(Scope.objects.values_list("id", flat=True))
+        expected = Auth.flatten_scopes(scope_ids)
+        with self.assertNumQueries(0):
+            self.assertSetEqual(Auth.flatten_scopes(scope_ids), expected)
+
+    def test_scopes_flatten_invalidated(self):
+        """
+        Test scope closure is rebuilt when a scope is removed
+        """
+        mgscope = Scope.objects.get(codename=PermissionCodes.Account.MANAGE)
+        vwscope = Scope.objects.get(codename=PermissionCodes.Account.VIEW)
+        self.assertIn(vwscope.id, Auth.flatten_scopes([mgscope.id]))
+        vwscope.delete(keep_parents=True)
+        self.assertNotIn(vwscope.id, Auth.flatten_scopes([mgscope.id]))
+        Scope.create_all()
+        self.assertIn(vwscope.id, Auth.flatten_scopes([mgscope.id]))
+
     def test_scope_granted_includes(self):
         """
         Test that granted property of auth includes nested scopes
@@ -111,6 +198,23 @@ class AccountTest(AccountMixin, TestCase):
         managing = {3}
         self.assertEqual(managing, account.managing)
 
+    def test_account_manage_memoized(self):
+        """
+        Test manage properties are resolved once per request until changed
+        """
+        user = Account.objects.get(pk=3)
+        same_user = Account.objects.get(pk=3)
+        mgr = Account.objects.get(pk=2)
+        Account.get_manage_scope()
+        with request_scope():
+            with self.assertNumQueries(1):
+                self.assertEqual(user.managers, {mgr.id})
+                self.assertEqual(same_user.managers, {mgr.id})
+            auth = Auth.objects.filter(user=user, owner=mgr, active=True).first()
+            auth.deactivate()
+            self.assertEqual(user.managers, set())
+            self.assertEqual(mgr.managing, set())
+
 
 class TripTest(FixturesMixin, TestCase):
     """
@@ -127,4 +231,4 @@ class TripTest(FixturesMixin, TestCase):
         trip = Trip.objects.create(
             account=account, length_time=trip_time, length_distance=trip_distance
         )
-        self.assertEqual(trip.date_created, trip.date_updated)
+        self.assertEqual(trip.date_created, trip.date_updated.date())
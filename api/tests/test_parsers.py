@@ -0,0 +1,29 @@
+"""
+Test parsers module
+"""
+from io import BytesIO
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+
+from api.parsers import NDJSONParser
+
+
+class NDJSONParserTest(SimpleTestCase):
+    """
+    Test newline delimited json parser
+    """
+
+    def test_parse(self):
+        """
+        Test each non blank line is parsed as an item
+        """
+        stream = BytesIO(b'{"a": 1}\n\n  {"b": 2}  \r\n[3]')
+        self.assertEqual(NDJSONParser().parse(stream), [{"a": 1}, {"b": 2}, [3]])
+
+    def test_parse_invalid(self):
+        """
+        Test invalid line raises parse error with line number
+        """
+        stream = BytesIO(b'{"a": 1}\n{"b": ')
+        with self.assertRaisesMessage(ParseError, "line 2"):
+            NDJSONParser().parse(stream)
@@ -1,12 +1,15 @@
 """
 Test permission module
 """
-from unittest.mock import MagicMock
-from django.test import SimpleTestCase
+from unittest.mock import MagicMock, patch
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase, TestCase
 
 from api import models, views
+from api.cache import request_scope
 from api.constants import Methods
-from api.permissions import JoggerPermissions
+from api.permissions import JoggerPermissions, JoggerPermissionsFilter
+from api.tests import AccountMixin
 
 
 class JoggerPermissionsTest(SimpleTestCase):
@@ -29,10 +32,17 @@ class JoggerPermissionsTest(SimpleTestCase):
         self.assertTrue(self.permissions.has_permission(request, view))
         request.user.is_superuser = False
         self.assertFalse(self.permissions.has_permission(request, view))
-        view = views.AccountViewSet()
+        view = views.AccountViewSet(action="list")
+        self.assertTrue(self.permissions.has_permission(request, view))
+        request.user = AnonymousUser()
+        self.assertFalse(self.permissions.has_permission(request, view))
+        view = views.TripViewSet(action="list")
+        self.assertFalse(self.permissions.has_permission(request, view))
+        view = views.AccountViewSet(action="create")
         self.assertTrue(self.permissions.has_permission(request, view))
 
-    def test_has_object_permission(self):
+    @patch("api.models.Account.get_managing")
+    def test_has_object_permission(self, get_managing):
         """
         Test object level access
         """
@@ -45,24 +55,87 @@ class JoggerPermissionsTest(SimpleTestCase):
         self.assertTrue(self.permissions.has_object_permission(req, _, _))
 
         req.user.is_superuser = False
+        get_managing.return_value = set()
         acc = MagicMock(spec=models.Account)
         acc.id = 99
-        acc.managers = {}
         self.assertFalse(self.permissions.has_object_permission(req, _, acc))
         req.user.id = acc.id
         self.assertTrue(self.permissions.has_object_permission(req, _, acc))
 
         req.user.id = 1
-        acc.managers = {req.user.id}
+        get_managing.return_value = {acc.id}
         req.method = Methods.DELETE
         self.assertFalse(self.permissions.has_object_permission(req, _, acc))
         req.method = Methods.GET
         self.assertTrue(self.permissions.has_object_permission(req, _, acc))
 
         trip = MagicMock(spec=models.Trip)
-        trip.account = MagicMock(spec=models.Account)
+        trip.account_id = 42
         self.assertFalse(self.permissions.has_object_permission(req, _, trip))
-        trip.account.id = user.id
+        trip.account_id = user.id
         self.assertTrue(self.permissions.has_object_permission(req, _, trip))
-        trip.account = acc
+        trip.account_id = acc.id
         self.assertTrue(self.permissions.has_object_permission(req, _, trip))
+        get_managing.assert_called_with(user.id)
+
+
+class JoggerPermissionsFilterTest(AccountMixin, TestCase):
+    """
+    Test jogger permissions queryset filter
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.filter = JoggerPermissionsFilter()
+
+    def filter_ids(self, user, queryset, method=Methods.GET):
+        """
+        Ids of queryset objects visible to user
+        """
+        request = MagicMock()
+        request.user = user
+        request.method = method
+        return set(
+            self.filter.filter_queryset(request, queryset, None).values_list(
+                "id", flat=True
+            )
+        )
+
+    def test_filter_accounts(self):
+        """
+        Test accounts are limited to self and managed accounts for reads
+        """
+        accounts = models.Account.objects.all()
+        self.assertEqual(self.filter_ids(self.user, accounts), {self.user.id})
+        self.assertEqual(
+            self.filter_ids(self.mgr, accounts), {self.mgr.id, self.user.id}
+        )
+        self.assertEqual(
+            self.filter_ids(self.mgr, accounts, Methods.PATCH), {self.mgr.id}
+        )
+        self.assertEqual(
+            self.filter_ids(self.superuser, accounts),
+            set(accounts.values_list("id", flat=True)),
+        )
+        self.assertEqual(self.filter_ids(AnonymousUser(), accounts), set())
+
+    def test_filter_trips(self):
+        """
+        Test trips are limited to own and managed account trips
+        """
+        trips = models.Trip.objects.all()
+        user_trips = set(self.user.trips.values_list("id", flat=True))
+        mgr_trips = set(self.mgr.trips.values_list("id", flat=True))
+        self.assertEqual(self.filter_ids(self.user, trips), user_trips)
+        self.assertEqual(self.filter_ids(self.mgr, trips), user_trips | mgr_trips)
+        self.assertEqual(self.filter_ids(self.user, models.Auth.objects.all()), set())
+
+    def test_filter_single_query(self):
+        """
+        Test managed accounts are resolved once per request
+        """
+        trips = models.Trip.objects.all()
+        with request_scope():
+            self.filter_ids(self.mgr, trips)
+            with self.assertNumQueries(1):
+                self.filter_ids(self.mgr, trips)
@@ -0,0 +1,101 @@
+"""
+Test database routers
+"""
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from unittest import skipUnless
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Trip
+from api.routers import ReplicaRouter, request_scope
+from api.tests import AccountMixin
+
+REPLICA = "replica_test"
+
+
+@skipUnless(connection.vendor == "sqlite", "replica is copied with sqlite backup")
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTest(AccountMixin, TransactionTestCase):
+    """
+    Test reads routed to a replica held in a second sqlite file
+    """
+
+    def setUp(self):
+        super().setUp()
+        handle, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        connection.ensure_connection()
+        with closing(sqlite3.connect(path)) as replica:
+            connection.connection.backup(replica)
+        connections.settings[REPLICA] = dict(
+            connections.settings[DEFAULT_DB_ALIAS], NAME=path
+        )
+        self.addCleanup(self.remove_replica)
+        # written after the copy so only found on the primary
+        self.lagging = Trip.objects.create(account=self.user, length_time=60)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def remove_replica():
+        """
+        Close and forget the replica connection
+        """
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def test_route_by_request(self):
+        """
+        Test reads use replica in safe requests until something is written
+        """
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Trip), DEFAULT_DB_ALIAS)
+        with request_scope("POST"):
+            self.assertEqual(router.db_for_read(Trip), DEFAULT_DB_ALIAS)
+        with request_scope("GET"):
+            self.assertEqual(router.db_for_read(Trip), REPLICA)
+            self.assertEqual(router.db_for_write(Trip), DEFAULT_DB_ALIAS)
+            self.assertEqual(router.db_for_read(Trip), DEFAULT_DB_ALIAS)
+        with request_scope("GET"):
+            self.assertEqual(router.db_for_read(Trip), REPLICA)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_route_without_replicas(self):
+        """
+        Test everything uses primary when no replicas are configured
+        """
+        with request_scope("GET"):
+            self.assertEqual(ReplicaRouter().db_for_read(Trip), DEFAULT_DB_ALIAS)
+
+    def test_safe_request_reads_replica(self):
+        """
+        Test listings are served from the replica
+        """
+        for url in (
+            reverse("trip-list"),
+            reverse("account-trips", args=[self.user.id]),
+        ):
+            response = self.client.get(url, {"limit": 100})
+            ids = {trip["id"] for trip in response.json()["results"]}
+            self.assertNotIn(self.lagging.id, ids)
+            self.assertEqual(len(ids), self.user.trips.count() - 1)
+
+    def test_unsafe_request_reads_primary(self):
+        """
+        Test reads of requests that write are served from the primary
+        """
+        url = reverse("trip-detail", args=[self.lagging.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.patch(url, {"length_time": 120})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.lagging.refresh_from_db()
+        self.assertEqual(self.lagging.length_time, 120)
@@ -0,0 +1,75 @@
+"""
+Test signal handlers
+"""
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import SimpleTestCase, override_settings
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 1024 * 1024,
+    "cache_size": -2048,
+    "busy_timeout": 1234,
+}
+
+
+@skipUnless(connection.vendor == "sqlite", "pragmas are sqlite only")
+class TuneSqliteTest(SimpleTestCase):
+    """
+    Test sqlite pragmas applied to new connections
+    """
+
+    def open(self):
+        """
+        Connect to a scratch sqlite file with default database settings
+        :returns DatabaseWrapper: connected wrapper closed on cleanup
+        """
+        handle, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        settings_dict = dict(connections.settings[DEFAULT_DB_ALIAS], NAME=path)
+        wrapper = type(connections[DEFAULT_DB_ALIAS])(settings_dict, "tune_test")
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    @staticmethod
+    def pragmas(wrapper):
+        """
+        Read current value of every tuned pragma
+        """
+        values = {}
+        with wrapper.cursor() as cursor:
+            for pragma in PRAGMAS:
+                cursor.execute("PRAGMA {}".format(pragma))
+                values[pragma] = cursor.fetchone()[0]
+        return values
+
+    @override_settings(SQLITE_PRAGMAS=PRAGMAS)
+    def test_tuned_connection(self):
+        """
+        Apply every configured pragma on connect
+        """
+        self.assertDictEqual(
+            self.pragmas(self.open()),
+            {
+                "journal_mode": "wal",
+                "synchronous": 1,
+                "mmap_size": 1024 * 1024,
+                "cache_size": -2048,
+                "busy_timeout": 1234,
+            },
+        )
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_default_connection(self):
+        """
+        Leave sqlite defaults without a profile
+        """
+        values = self.pragmas(self.open())
+        self.assertEqual(values["journal_mode"], "delete")
+        self.assertEqual(values["synchronous"], 2)
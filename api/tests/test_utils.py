@@ -1,13 +1,20 @@
 """
 Test utility module
 """
-from unittest.mock import patch
-from email.mime.text import MIMEText
+import os
+from tempfile import NamedTemporaryFile
 from django.test import SimpleTestCase
 from django.utils.crypto import get_random_string
 from rest_framework.exceptions import APIException
 
-from api.utils import has_required, peek, raise_api_exc, replace, send_mail
+from api.constants import Templates
+from api.utils import (
+    MailTemplate,
+    has_required,
+    peek,
+    raise_api_exc,
+    render_mail,
+)
 
 
 class UtilsTest(SimpleTestCase):
@@ -41,36 +48,40 @@ class UtilsTest(SimpleTestCase):
                 self.assertEqual(exc.status_code, status_code)
                 raise exc
 
-    def test_multireplace(self):
+    def test_mail_template(self):
         """
-        Test utils.replace function
+        Test mail template is rendered and cached until changed in debug
         """
-        str_to_replace = "please replace me with nice things"
-        replace_map = {
-            "please": "bloody",
-            "replace": "please",
-            "bloody": "whyyy!!!",
-            "things": "flowers",
-        }
-        result = replace(str_to_replace, replace_map)
-        self.assertEqual(result, "bloody please me with nice flowers")
+        with NamedTemporaryFile("w", suffix=".tmpl") as tmpl:
+            tmpl.write("{greeting} {name}, {unknown}{name}")
+            tmpl.flush()
+            template = MailTemplate.get(tmpl.name)
+            self.assertIs(MailTemplate.get(tmpl.name), template)
+            self.assertEqual(
+                template.render({"{greeting}": "hi", "{name}": "$1\\"}),
+                "hi $1\\, {unknown}$1\\",
+            )
+            tmpl.write(" changed")
+            tmpl.flush()
+            os.utime(tmpl.name, (0, 0))
+            with self.settings(DEBUG=False):
+                self.assertIs(MailTemplate.get(tmpl.name), template)
+            with self.settings(DEBUG=True):
+                self.assertTrue(
+                    MailTemplate.get(tmpl.name).render({}).endswith("changed")
+                )
 
-    @patch("api.utils.smtplib", autospec=True)
-    @patch("api.utils.replace", autospec=True)
-    def test_send_mail(self, mock_replace, _):
+    def test_render_mail(self):
         """
-        Test mail sending function
+        Test mail body is rendered before mime encoding
         """
-        sender = "mailsender@example.com"
-        receivers = ["longreciever@example.com", "shortreceiver@example.com"]
-        subject = "this is a subject"
-        message = MIMEText("")
-        message.preamble = subject
-        message["Subject"] = subject
-        message["From"] = sender
-        message["To"] = ", ".join(receivers)
-        mock_replace.return_value = message.as_string()
-        message_data = {"test": "me"}
-        res = send_mail(sender, receivers, subject, "/dev/null", message_data)
-        mock_replace.assert_called_with(message.as_string(), message_data)
-        self.assertIsNotNone(res)
+        msg = render_mail(
+            "sender@example.com",
+            ["reciever@example.com"],
+            "Account Password Reset",
+            Templates.Email.RESET_REQUEST,
+            {"{email}": "reciever@example.com", "{reset_confirm_link}": "link"},
+        )
+        self.assertIn("To: reciever@example.com", msg)
+        self.assertIn("for your account (reciever@example.com)", msg)
+        self.assertNotIn("{reset_confirm_link}", msg)
@@ -2,17 +2,23 @@
 Test api endpoints
 """
 import json
+import threading
+from datetime import date, timedelta
 
 from unittest.mock import patch
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 from rest_framework import status
 from rest_framework.exceptions import APIException
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
 
-from api.constants import Limits
-from api.models import Account
+from api.constants import Limits, PermissionCodes
+from api.models import Account, Auth, Mail, Scope, Trip, TripRollup
+from api.serializers import TripSerializer
 from api.tests import AccountMixin
 from api.utils import peek
 from api.views import auth_manager
@@ -30,6 +36,9 @@ class AccountViewsTest(AccountMixin, APITestCase):
         url = reverse("scope-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        for url in (reverse("account-list"), reverse("trip-list")):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
     def test_auth_access_allowed(self):
         """
@@ -40,6 +49,46 @@ class AccountViewsTest(AccountMixin, APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_scope_list_snapshot(self):
+        """
+        Test scopes are served from a snapshot with etag support
+        """
+        url = reverse("scope-list")
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url, {"limit": 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        results = response.json()["results"]
+        self.assertEqual(len(results), Scope.objects.count())
+        manage = peek(
+            r for r in results if r["codename"] == PermissionCodes.Account.MANAGE
+        )
+        self.assertEqual(
+            {r["codename"] for r in manage["includes"]},
+            set(PermissionCodes.graph[PermissionCodes.Account.MANAGE]),
+        )
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"limit": 100})
+        self.assertEqual(response.json()["results"], results)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        detail_url = reverse("scope-detail", args=[manage["id"]])
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(detail_url)
+        self.assertEqual(response.json(), manage)
+        response = self.client.get(reverse("scope-detail", args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        scope = Scope.objects.get(pk=manage["id"])
+        scope.name = "Manage all the accounts"
+        scope.save()
+        response = self.client.get(url, {"limit": 100}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(scope.name, {r["name"] for r in response.json()["results"]})
+
     def test_super_restricted_route(self):
         """
         Test superusers only route
@@ -55,6 +104,28 @@ class AccountViewsTest(AccountMixin, APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_auth_list_queries(self):
+        """
+        Test listing auths takes the same number of queries for any page size
+        """
+        scopes = list(Scope.objects.all())
+        for _ in range(20):
+            auth = Auth.objects.create(user=self.user, owner=self.mgr)
+            auth.scopes.set(scopes)
+        url = reverse("auth-list")
+        self.client.force_authenticate(user=self.superuser)
+        # load the scope closure shared by every request
+        self.client.get(url, {"limit": 1})
+        counts = []
+        for limit in (1, 20):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {"limit": limit})
+            self.assertEqual(len(response.json()["results"]), limit)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        granted = response.json()["results"][-1]["granted"]
+        self.assertCountEqual(granted, Auth.flatten_scopes(s.id for s in scopes))
+
     def test_account_create(self):
         """
         Test user sign up
@@ -100,6 +171,7 @@ class AccountViewsTest(AccountMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         acc.refresh_from_db()
         self.assertIsNotNone(acc.reset_code)
+        self.assertTrue(Mail.objects.filter(recievers=acc.email).exists())
 
     @patch("api.utils.smtplib", autospec=True)
     def test_account_reset_confirm(self, _):
@@ -139,6 +211,23 @@ class AccountViewsTest(AccountMixin, APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_account_profile_conditional(self):
+        """
+        Test profile answers conditional requests until it changes
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("account-profile")
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.patch(url, data={"first_name": "Changed"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["first_name"], "Changed")
+
     def test_account_update(self):
         """
         Test updating of user account
@@ -231,6 +320,62 @@ class TripViewsTest(AccountMixin, APITestCase):
         response = self.client.post(url, data=data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_user_trips_bulk_create(self):
+        """
+        Test create list of user trips in one request
+        """
+        self.client.force_authenticate(self.user)
+        data = [{"length_distance": 100 * i, "length_time": 600 * i} for i in range(5)]
+        count = self.user.trips.count()
+        url = reverse("trip-list")
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        result = json.loads(response.content)
+        self.assertEqual(len(result), len(data))
+        self.assertTrue(all(trip["owner"] == self.user.id for trip in result))
+        self.assertTrue(all(trip["id"] for trip in result))
+        self.assertEqual(self.user.trips.count(), count + len(data))
+
+    def test_user_trips_bulk_create_ndjson(self):
+        """
+        Test create user trips from newline delimited json stream
+        """
+        self.client.force_authenticate(self.mgr)
+        data = [{"length_distance": 100 * i, "length_time": 600 * i} for i in range(3)]
+        count = self.user.trips.count()
+        url = reverse("account-trips", args=[self.user.id])
+        response = self.client.post(
+            url,
+            data="\n".join(json.dumps(trip) for trip in data) + "\n",
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        result = json.loads(response.content)
+        self.assertTrue(all(trip["owner"] == self.user.id for trip in result))
+        self.assertEqual(self.user.trips.count(), count + len(data))
+        response = self.client.post(
+            url, data='{"length_time": 1}\n{', content_type="application/x-ndjson"
+        )
+        self.assertContains(response, "line 2", status_code=status.HTTP_400_BAD_REQUEST)
+
+    def test_user_trips_bulk_create_invalid(self):
+        """
+        Test no trips are created when any trip in list is invalid
+        """
+        self.client.force_authenticate(self.user)
+        data = [
+            {"length_distance": 100, "length_time": 600},
+            {"length_distance": 100, "length_time": -600},
+        ]
+        count = self.user.trips.count()
+        url = reverse("trip-list")
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        result = json.loads(response.content)
+        self.assertEqual(result[0], {})
+        self.assertIn("length_time", result[1])
+        self.assertEqual(self.user.trips.count(), count)
+
     def test_user_trips_read(self):
         """
         Test access on /account/1/trips, /trips and /trips/{id}
@@ -245,6 +390,444 @@ class TripViewsTest(AccountMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertContains(response, "count")
 
+    def test_user_trips_read_values(self):
+        """
+        Test trip lists read as values match the model serializer output
+        """
+        Trip.objects.create(account=self.user, length_time=60, length_distance=100)
+        trips = self.user.trips.order_by("date_created", "id")
+        expected = [dict(data) for data in TripSerializer(trips, many=True).data]
+        self.client.force_authenticate(self.user)
+        url = reverse("account-trips", args=[self.user.id])
+        response = self.client.get(url, {"pagination": "cursor", "limit": 2})
+        self.assertEqual(response.json()["results"], expected[:2])
+        for url in (url, reverse("trip-list")):
+            response = self.client.get(url, {"limit": 100})
+            results = response.json()["results"]
+            self.assertCountEqual(results, expected)
+
+    def test_user_trips_filter(self):
+        """
+        Test trip lists filtered by bounds and ordered by whitelisted fields
+        """
+        Trip.objects.bulk_create(
+            Trip(account=self.user, length_distance=1000 * i, length_time=300 * i)
+            for i in range(6)
+        )
+        Trip.objects.filter(account=self.user).update(date_created="2018-05-01")
+        Trip.objects.filter(account=self.user, length_distance__gte=4000).update(
+            date_created="2018-06-01"
+        )
+        self.client.force_authenticate(self.user)
+        url = reverse("account-trips", args=[self.user.id])
+
+        def distances(params):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [trip["length_distance"] for trip in response.json()["results"]]
+
+        expected = sorted(
+            t.length_distance for t in self.user.trips.filter(length_distance__gte=2000)
+        )
+        self.assertEqual(
+            distances({"min_distance": 2000, "ordering": "length_distance"}), expected
+        )
+        self.assertEqual(
+            distances({"min_distance": 2000, "ordering": "-length_distance"}),
+            expected[::-1],
+        )
+        self.assertEqual(distances({"start": "2018-06-01"}), [4000, 5000])
+        self.assertEqual(
+            distances(
+                {"end": "2018-05-31", "min_time": 900, "ordering": "length_time"}
+            ),
+            [3000],
+        )
+        # every trip runs at 300 seconds per kilometre, empty trips have no pace
+        paced = distances({"min_pace": 299, "max_pace": 301})
+        self.assertEqual(len(paced), 5)
+        self.assertEqual(distances({"max_pace": 299}), [])
+
+        for params in (
+            {"ordering": "account"},
+            {"ordering": "pace"},
+            {"min_distance": 10, "max_distance": 1},
+            {"start": "2018-06-01", "end": "2018-05-01"},
+            {"min_pace": -1},
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_trips_filter_cursor(self):
+        """
+        Test cursor pages follow the requested ordering
+        """
+        Trip.objects.bulk_create(
+            Trip(account=self.user, length_distance=i % 4, length_time=1)
+            for i in range(12)
+        )
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-list")
+        params = {"ordering": "-length_distance", "pagination": "cursor", "limit": 5}
+        seen = []
+        while url:
+            data = self.client.get(url, params).json()
+            seen.extend((t["length_distance"], t["id"]) for t in data["results"])
+            url, params = data["next"], None
+        expected = sorted(
+            self.user.trips.values_list("length_distance", "id"), reverse=True
+        )
+        self.assertEqual(seen, expected)
+
+    def test_user_trips_read_conditional(self):
+        """
+        Test trip lists and details answer conditional requests
+        """
+        self.client.force_authenticate(self.user)
+        trip = self.user.trips.first()
+        for url in (
+            reverse("trip-list"),
+            reverse("account-trips", args=[self.user.id]),
+            reverse("trip-detail", args=[trip.id]),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            if url.endswith("trips"):
+                self.assertFalse(response.has_header("Last-Modified"))
+            else:
+                last_modified = response["Last-Modified"]
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            trip.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_user_trips_read_conditional_delete(self):
+        """
+        Test trip list validators change when a trip is deleted
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-list")
+        yesterday = timezone.now() - timedelta(days=1)
+        Trip.objects.update(date_updated=yesterday)
+        etag = self.client.get(url)["ETag"]
+        trip = self.user.trips.first()
+        response = self.client.delete(reverse("trip-detail", args=[trip.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_trips_read_conditional_filtered(self):
+        """
+        Test filtered trip list etag changes when a trip is edited out of it
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-list")
+        trip = self.user.trips.first()
+        Trip.objects.filter(pk=trip.id).update(length_distance=500)
+        params = {"max_distance": 1000}
+        etag = self.client.get(url, params)["ETag"]
+        response = self.client.patch(
+            reverse("trip-detail", args=[trip.id]), {"length_distance": 5000}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(trip.id, [row["id"] for row in response.json()["results"]])
+
+    def test_user_trips_read_conditional_cursor(self):
+        """
+        Test cursor pages are validated without counting trips
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-list")
+        self.client.get(url, {"pagination": "cursor"})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"pagination": "cursor"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            any("COUNT(" in query["sql"].upper() for query in queries.captured_queries)
+        )
+
+    def test_user_trips_sync(self):
+        """
+        Test syncing trips changed and deleted since a watermark
+        """
+        self.client.force_authenticate(self.user)
+        for url in (
+            reverse("trip-list"),
+            reverse("account-trips", args=[self.user.id]),
+        ):
+            response = self.client.get(url, {"since": "2000-01-01T00:00:00Z"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertEqual(len(data["trips"]), self.user.trips.count())
+            self.assertEqual(data["deleted"], [])
+            watermark = data["watermark"]
+            response = self.client.get(url, {"since": watermark})
+            self.assertEqual(
+                response.json(),
+                {"watermark": watermark, "trips": [], "deleted": [], "has_more": False},
+            )
+
+        updated, deleted = self.user.trips.all()[:2]
+        updated.save()
+        response = self.client.delete(reverse("trip-detail", args=[deleted.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(reverse("trip-list"), {"since": watermark})
+        data = response.json()
+        self.assertEqual([trip["id"] for trip in data["trips"]], [updated.id])
+        self.assertEqual(data["deleted"], [deleted.id])
+        self.assertGreater(data["watermark"], watermark)
+
+        self.client.force_authenticate(self.mgr)
+        response = self.client.get(reverse("trip-list"), {"since": watermark})
+        self.assertEqual(response.json()["deleted"], [deleted.id])
+        email = "username@example.com"
+        self.client.force_authenticate(
+            Account.objects.create(username=email, email=email)
+        )
+        response = self.client.get(reverse("trip-list"), {"since": watermark})
+        self.assertEqual(response.json()["deleted"], [])
+
+    def test_user_trips_sync_overlap(self):
+        """
+        Test recent changes are sent again so late commits are not skipped
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-list")
+        early, late = self.user.trips.all()[:2]
+        response = self.client.get(url, {"since": "2000-01-01T00:00:00Z"})
+        watermark = response.json()["watermark"]
+        late.save()
+        data = self.client.get(url, {"since": watermark}).json()
+        self.assertEqual([trip["id"] for trip in data["trips"]], [late.id])
+        # stamped before the trip already synced but committed after
+        stamp = timezone.now() - timedelta(seconds=1)
+        Trip.objects.filter(pk=early.id).update(date_updated=stamp)
+        data = self.client.get(url, {"since": data["watermark"]}).json()
+        self.assertEqual([trip["id"] for trip in data["trips"]], [early.id, late.id])
+
+    def test_user_trips_sync_limit(self):
+        """
+        Test sync is paged by watermark until no more changes follow
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-list")
+        start = timezone.now() - timedelta(days=1)
+        trip_ids = list(self.user.trips.order_by("id").values_list("id", flat=True))
+        for i, trip_id in enumerate(trip_ids):
+            stamp = start + timedelta(seconds=i)
+            Trip.objects.filter(pk=trip_id).update(date_updated=stamp)
+        seen = []
+        params = {"since": "2000-01-01T00:00:00Z"}
+        with patch.object(Limits, "TRIP_SYNC_LIMIT", 1):
+            while True:
+                data = self.client.get(url, params).json()
+                self.assertLessEqual(len(data["trips"]), 1)
+                seen += [trip["id"] for trip in data["trips"]]
+                params["since"] = data["watermark"]
+                if not data["has_more"]:
+                    break
+        self.assertEqual(seen, trip_ids)
+
+    def test_user_trips_sync_invalid(self):
+        """
+        Test sync rejects an invalid watermark
+        """
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("trip-list"), {"since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_trips_export(self):
+        """
+        Test streaming export of full account trip history
+        """
+        self.client.force_authenticate(self.mgr)
+        url = reverse("account-trip-export", args=[self.user.id])
+        trips = list(self.user.trips.order_by("date_created", "id"))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn(
+            "trips-{}.csv".format(self.user.id), response["Content-Disposition"]
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,owner,date_created,length_distance,length_time")
+        self.assertEqual(len(lines), len(trips) + 1)
+
+        response = self.client.get(url, {"type": "ndjson"})
+        content = b"".join(response.streaming_content).decode()
+        rows = [json.loads(line) for line in content.splitlines()]
+        expected = self.client.get(
+            reverse("account-trips", args=[self.user.id]), {"limit": len(trips)}
+        ).json()["results"]
+        self.assertEqual(rows, expected)
+
+        response = self.client.get(url, {"type": "gpx"})
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("<trk>"), len(trips))
+        self.assertTrue(content.rstrip().endswith("</gpx>"))
+
+        response = self.client.get(url, {"type": "xls"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(self.user)
+        url = reverse("account-trip-export", args=[self.mgr.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_trips_read_cursor(self):
+        """
+        Test paging through trips with keyset cursor
+        """
+        Trip.objects.bulk_create(
+            Trip(account=self.user, length_time=60 * i) for i in range(7)
+        )
+        expected = list(
+            Trip.objects.filter(account=self.user)
+            .order_by("date_created", "id")
+            .values_list("id", flat=True)
+        )
+        self.client.force_authenticate(self.user)
+        for url in [
+            reverse("trip-list"),
+            reverse("account-trips", args=[self.user.id]),
+        ]:
+            seen = []
+            url = "{}?pagination=cursor&limit=3".format(url)
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                result = json.loads(response.content)
+                self.assertNotIn("count", result)
+                seen.extend(trip["id"] for trip in result["results"])
+                url = result["next"]
+            self.assertEqual(seen, expected)
+
+    def test_user_trips_read_cursor_invalid(self):
+        """
+        Test reading trips with invalid cursor is not found
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-list")
+        for cursor in ["not-a-cursor", "WzFd", "WyJub3QtYS1kYXRlIiwgMV0="]:
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_trips_stats(self):
+        """
+        Test weekly and monthly trip totals
+        """
+        Trip.objects.filter(account=self.user).delete()
+        dates = ["2018-04-27", "2018-04-30", "2018-05-01", "2018-05-07"]
+        for i, created in enumerate(dates, 1):
+            trip = Trip.objects.create(
+                account=self.user, length_distance=1000 * i, length_time=100 * i
+            )
+            trip.date_created = date.fromisoformat(created)
+            trip.save()
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-stats")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = json.loads(response.content)
+        self.assertEqual(
+            [(row["period"], row["trips"]) for row in result],
+            [("2018-04-23", 1), ("2018-04-30", 2), ("2018-05-07", 1)],
+        )
+        self.assertEqual(result[1]["length_distance"], 5000)
+        self.assertEqual(result[1]["length_time"], 500)
+        self.assertEqual(result[1]["average_speed"], 10.0)
+        url = reverse("account-trip-stats", args=[self.user.id])
+        data = {"period": "month", "start": "2018-04-28", "end": "2018-05-31"}
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = json.loads(response.content)
+        self.assertEqual(
+            [(row["period"], row["trips"]) for row in result],
+            [("2018-04-01", 1), ("2018-05-01", 2)],
+        )
+
+    def test_user_trips_stats_maintained(self):
+        """
+        Test trip totals follow trips created, updated and deleted
+        """
+
+        def rollups():
+            return list(
+                TripRollup.objects.order_by("account", "period", "date").values_list(
+                    "account", "period", "date", "trips", "length_distance"
+                )
+            )
+
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-list")
+        data = [{"length_distance": 100, "length_time": 600}] * 2
+        response = self.client.post(url, data=data, format="json")
+        created = json.loads(response.content)
+        response = self.client.post(url, data={"length_time": 60})
+        created.append(json.loads(response.content))
+        url = reverse("trip-detail", args=[created[0]["id"]])
+        self.client.patch(url, data={"length_distance": 350})
+        url = reverse("trip-detail", args=[created[1]["id"]])
+        self.client.delete(url)
+        maintained = rollups()
+        TripRollup.rebuild()
+        self.assertEqual(maintained, rollups())
+        url = reverse("trip-detail", args=[created[0]["id"]])
+        self.client.delete(url)
+        for trip in self.user.trips.all():
+            self.client.delete(reverse("trip-detail", args=[trip.id]))
+        self.assertFalse(self.user.rollups.exists())
+
+    def test_user_trips_stats_fixtures(self):
+        """
+        Test trip totals are kept for trips loaded and written outside the api
+        """
+
+        def rollups():
+            return list(
+                TripRollup.objects.order_by("account", "period", "date").values_list(
+                    "account", "period", "date", "trips", "length_distance"
+                )
+            )
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("trip-stats"))
+        self.assertEqual(
+            sum(row["trips"] for row in response.json()), self.user.trips.count()
+        )
+        trip = Trip.objects.create(account=self.user, length_time=60)
+        trip.length_distance = 500
+        trip.save()
+        Trip.objects.get(pk=self.user.trips.first().pk).delete()
+        loaded = rollups()
+        TripRollup.rebuild()
+        self.assertEqual(loaded, rollups())
+        user_id = self.user.id
+        self.user.delete()
+        self.assertEqual(rollups(), [row for row in loaded if row[0] != user_id])
+
+    def test_user_trips_stats_invalid(self):
+        """
+        Test trip totals with invalid parameters or account
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("trip-stats")
+        for data in [{"period": "day"}, {"start": "2018-05-01", "end": "2018-04-01"}]:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        url = reverse("account-trip-stats", args=[self.mgr.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_user_trips_update(self):
         """
         Test update on account trips
@@ -362,8 +945,7 @@ class AccountManagerTest(AccountMixin, APITestCase):
         response = self.client.post(url, data=data)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
-        auth.code = dummy_auth_code
-        auth.save()
+        auth.set_code(dummy_auth_code, True)
         response = self.client.post(url, data=data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
@@ -381,7 +963,7 @@ class AccountManagerTest(AccountMixin, APITestCase):
                 self.user.refresh_from_db()
                 email = email_tmpl.format(i)
                 account = Account.objects.create(username=email, email=email)
-                auth = auth_manager(self.user, account)
+                auth, _ = auth_manager(self.user, account)
                 auth.activate()
         url = reverse("account-managers")
         self.client.force_authenticate(self.user)
@@ -398,13 +980,30 @@ class AccountManagerTest(AccountMixin, APITestCase):
                 self.user.refresh_from_db()
                 email = email_tmpl.format(i)
                 account = Account.objects.create(username=email, email=email)
-                auth = auth_manager(account, self.user)
+                auth, _ = auth_manager(account, self.user)
                 auth.activate()
         url = reverse("account-managers")
         self.client.force_authenticate(self.mgr)
         response = self.client.post(url, {"email": self.user.email})
         self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
 
+    def test_acc_manager_request_reuses_auth(self):
+        """
+        Test repeated manager requests reuse a single authorisation row
+        """
+        email = "username@example.com"
+        account = Account.objects.create(username=email, email=email)
+        auth, first_code = auth_manager(self.user, account)
+        auths = Account.get_manage_scope().auths.filter(owner_id=account.id)
+        for _ in range(3):
+            reused, code = auth_manager(self.user, account)
+            self.assertEqual(reused.id, auth.id)
+            self.assertNotEqual(code, first_code)
+        self.assertEqual(auths.count(), 1)
+        self.assertEqual(Auth.scopes.through.objects.filter(auth=auth).count(), 1)
+        self.assertFalse(Auth.get_pending(first_code).exists())
+        self.assertTrue(Auth.get_pending(code).exists())
+
     def test_get_account_managing(self):
         """
         Test get account managing endpoint
@@ -494,3 +1093,84 @@ class AccountManagerTest(AccountMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.user.refresh_from_db()
         self.assertNotIn(self.mgr.id, self.user.managers)
+
+
+class AccountManagerConcurrencyTest(AccountMixin, APITransactionTestCase):
+    """
+    Test manager limits hold under concurrent requests
+    """
+
+    def hammer(self, requests):
+        """
+        Run requests at the same time each on its own connection
+        :param list requests: (account, method, url, data) to request with
+        :returns list: response status codes
+        """
+        barrier = threading.Barrier(len(requests))
+        statuses = []
+
+        def run(account, method, url, data):
+            client = APIClient()
+            client.force_authenticate(account)
+            try:
+                barrier.wait()
+                statuses.append(getattr(client, method)(url, data=data).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=args) for args in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(statuses), len(requests))
+        return statuses
+
+    def test_concurrent_manager_requests(self):
+        """
+        Test concurrent requests for the same manager keep one pending auth
+        """
+        url = reverse("account-managers")
+        email = "username@example.com"
+        account = Account.objects.create(username=email, email=email)
+        statuses = self.hammer([(self.user, "post", url, {"email": email})] * 8)
+        self.assertEqual(set(statuses), {status.HTTP_202_ACCEPTED})
+        auths = Account.get_manage_scope().auths.filter(
+            user_id=self.user.id, owner_id=account.id
+        )
+        self.assertEqual(auths.count(), 1)
+        self.assertFalse(auths.get().active)
+
+    def test_concurrent_manager_confirms(self):
+        """
+        Test concurrent confirmations cannot exceed the manager limit
+        """
+        url = reverse("account-managing")
+        managed = len(self.user.managers)
+        requests = []
+        for i in range(Limits.ACCOUNT_MANAGER + 3):
+            email = "username{}@example.com".format(i)
+            account = Account.objects.create(username=email, email=email)
+            _, code = auth_manager(self.user, account)
+            requests.append((account, "post", url, {"code": code}))
+        statuses = self.hammer(requests)
+        self.assertEqual(
+            set(statuses), {status.HTTP_200_OK, status.HTTP_406_NOT_ACCEPTABLE}
+        )
+        managers = Account.get_managers(self.user.id)
+        self.assertEqual(len(managers), Limits.ACCOUNT_MANAGER)
+        self.assertEqual(statuses.count(status.HTTP_200_OK), len(managers) - managed)
+
+    def test_confirm_locks_accounts_together(self):
+        """
+        Test confirmation locks both accounts in one ordered call
+        """
+        email = "lockorder@example.com"
+        account = Account.objects.create(username=email, email=email)
+        _, code = auth_manager(self.user, account)
+        client = APIClient()
+        client.force_authenticate(account)
+        with patch.object(Account, "lock", wraps=Account.lock) as lock:
+            response = client.post(reverse("account-managing"), data={"code": code})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lock.assert_called_once_with([self.user.id, account.id])
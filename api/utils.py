@@ -1,10 +1,15 @@
 """
 Utility functions for api module
 """
+import hashlib
+import json
+import os
 import re
 import smtplib
 from email.mime.text import MIMEText
 
+from django.conf import settings
+
 from api.constants import MAIL_HOST, MAIL_PORT
 
 
@@ -37,37 +42,122 @@ def raise_api_exc(exc, status_code):
     raise exc
 
 
-def replace(string, replxs):
+def etag(data):
     """
-    Given a string and a replacement map, it returns the replaced string.
-    https://goo.gl/7fcBpE
-    :param str string: string to execute replacements on
-    :param dict replxs: replacement map {value to find: value to replace}
-    :rtype: str
+    Quoted entity tag identifying json serializable data
+    :param data: data sent in response body
+    """
+    encoded = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return '"{}"'.format(hashlib.md5(encoded).hexdigest())
+
+
+class MailTemplate:
     """
-    substrs = sorted(replxs, key=len, reverse=True)
-    regexp = re.compile("|".join(map(re.escape, substrs)))
-    return regexp.sub(lambda match: replxs.get(match.group(0), ""), string)
+    Email template parsed once and rendered by placeholder substitution
+    Templates are cached by path and reloaded on change only in DEBUG
+    :property parts: template text split into literals and {placeholders}
+    """
+
+    PLACEHOLDER = re.compile(r"(\{\w+\})")
+    _cache = {}
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        with open(path, "r") as fstream:
+            self.parts = self.PLACEHOLDER.split(fstream.read())
+
+    @classmethod
+    def get(cls, path):
+        """
+        Get cached template for path, loading it if missing
+        :param str path: template file path
+        """
+        template = cls._cache.get(path)
+        if template is None or (
+            settings.DEBUG and os.stat(path).st_mtime != template.mtime
+        ):
+            template = cls._cache[path] = cls(path)
+        return template
+
+    def render(self, data):
+        """
+        Substitute placeholders in template, unknown placeholders are kept
+        :param dict data: placeholder to string replacement
+        :rtype: str
+        """
+        parts = self.parts.copy()
+        # split places placeholders at odd indexes
+        for i in range(1, len(parts), 2):
+            parts[i] = data.get(parts[i], parts[i])
+        return "".join(parts)
 
 
-def send_mail(sender, recievers, subject, tmpl_file, tmpl_data):
+def render_mail(sender, recievers, subject, tmpl_file, tmpl_data):
     """
-    Send mail using localhost smtp
+    Build mail message from template
     :param str sender: email to send from
     :param list recievers: list of emails to send to
     :param str subject: the email subject
     :param str tmpl_file: file path to use as email body template
     :param dict tmpl_data: keys to string replacement for email template
+    :rtype: str
     """
-    with open(tmpl_file, "r") as fstream:
-        msg = MIMEText(fstream.read())
+    msg = MIMEText(MailTemplate.get(tmpl_file).render(tmpl_data))
     msg.preamble = subject
     msg["Subject"] = subject
     msg["From"] = sender
     msg["To"] = ", ".join(recievers)
-    msg = replace(msg.as_string(), tmpl_data)
+    return msg.as_string()
+
+
+class MailConnection:
+    """
+    Persistent smtp connection reopened when dropped by the server
+    """
+
+    def __init__(self, host=None, port=None, timeout=30):
+        self.host = host or MAIL_HOST
+        self.port = port or MAIL_PORT
+        self.timeout = timeout
+        self.smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def open(self):
+        """
+        Connect to smtp server if not connected
+        """
+        if self.smtp is None:
+            self.smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+
+    def close(self):
+        """
+        Disconnect from smtp server ignoring connection errors
+        """
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.smtp = None
 
-    smtp = smtplib.SMTP(MAIL_HOST, MAIL_PORT)
-    smtp.sendmail(sender, recievers, msg)
-    smtp.quit()
-    return msg
+    def send(self, sender, recievers, msg):
+        """
+        Send message reconnecting once if the connection was dropped
+        :param str sender: email to send from
+        :param list recievers: list of emails to send to
+        :param str msg: full message to send
+        """
+        self.open()
+        try:
+            self.smtp.sendmail(sender, recievers, msg)
+        except smtplib.SMTPServerDisconnected:
+            self.smtp = None
+            self.open()
+            self.smtp.sendmail(sender, recievers, msg)
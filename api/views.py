@@ -1,19 +1,37 @@
 """
 Api app views
 """
-from django.http import Http404, JsonResponse
+import functools
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import FloatField, Max, Sum
+from django.db.models.functions import Cast, NullIf, TruncMonth, TruncWeek
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
 from django.utils.crypto import get_random_string
+from django.utils.http import http_date
 from rest_framework import status, viewsets
+from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.exceptions import APIException
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import SAFE_METHODS, AllowAny
 from rest_framework.response import Response
 
-from api import models, permissions, serializers, utils
-from api.constants import MAIL_FROM, Limits, Methods, PermissionCodes, Templates
-from api.utils import send_mail
+from api import (
+    cache,
+    exports,
+    hashers,
+    models,
+    pagination,
+    permissions,
+    serializers,
+    utils,
+)
+from api.constants import MAIL_FROM, Limits, Methods, Periods, Templates
 
 
 @api_view([Methods.POST])
@@ -25,8 +43,11 @@ def auth_user(request):
     data = request.data
     if utils.has_required(data.keys(), {"email", "password"}):
         user = get_object_or_404(models.Account, email=data["email"])
-        if user.check_password(data["password"]):
-            response = JsonResponse(serializers.AccountSerializer(user).data)
+        if hashers.check_account_password(user, data["password"]):
+            token, _ = Token.objects.get_or_create(user=user)
+            response = JsonResponse(
+                dict(serializers.AccountSerializer(user).data, token=token.key)
+            )
         else:
             utils.raise_api_exc(
                 APIException("invalid credentials"), status.HTTP_400_BAD_REQUEST
@@ -38,6 +59,20 @@ def auth_user(request):
     return response
 
 
+def get_account(request):
+    """
+    Account of the authenticated user loaded at most once per request
+    Unsafe requests reload a cached principal so stale columns are never saved
+    :raises Http404: if user has no account
+    """
+    user = request.user
+    if not isinstance(user, models.Account) or (
+        request.method not in SAFE_METHODS and user.is_cached_principal
+    ):
+        request.user = get_object_or_404(models.Account, pk=user.id)
+    return request.user
+
+
 @api_view([Methods.GET, Methods.POST])
 @permission_classes([AllowAny])
 def auth_reset(request):
@@ -95,7 +130,7 @@ def _send_reset_request_mail(request, user, code):
     reset_link = "{}?code={}".format(
         request.build_absolute_uri(reverse("auth-reset")), code
     )
-    send_mail(
+    models.Mail.queue(
         sender=MAIL_FROM,
         recievers=[user.email],
         subject="Account Password Reset",
@@ -108,7 +143,7 @@ def _send_reset_confirm_mail(_, user):
     """
     Send confirmation of password reset change
     """
-    send_mail(
+    models.Mail.queue(
         sender=MAIL_FROM,
         recievers=[user.email],
         subject="Account Password Changed",
@@ -125,13 +160,51 @@ class ScopeViewSet(viewsets.ModelViewSet):
     queryset = models.Scope.objects.all()
     serializer_class = serializers.ScopeSerializer
 
+    def get_tree(self):
+        """
+        Serialized scopes and their etag shared until any scope is written
+        """
+
+        def build():
+            results = [
+                dict(data)
+                for data in serializers.ScopeSerializer(
+                    self.get_queryset(), many=True
+                ).data
+            ]
+            return {
+                "etag": utils.etag(results),
+                "results": results,
+                "by_id": {str(data["id"]): data for data in results},
+            }
+
+        return cache.scopes.get(build)
+
+    def list(self, request, *args, **kwargs):
+        tree = self.get_tree()
+
+        def render():
+            page = self.paginate_queryset(tree["results"])
+            if page is None:
+                return Response(tree["results"])
+            return self.get_paginated_response(page)
+
+        return conditional_response(request, render, tree["etag"])
+
+    def retrieve(self, request, *args, **kwargs):
+        tree = self.get_tree()
+        data = tree["by_id"].get(str(kwargs[self.lookup_field]))
+        if data is None:
+            raise Http404
+        return conditional_response(request, lambda: Response(data), tree["etag"])
+
 
 class AuthViewSet(viewsets.ModelViewSet):
     """
     Control auth model
     """
 
-    queryset = models.Auth.objects.all()
+    queryset = models.Auth.objects.prefetch_related("scopes")
     serializer_class = serializers.AuthSerializer
     permission_classes = (permissions.JoggerPermissions,)
 
@@ -144,17 +217,18 @@ class AccountViewSet(viewsets.ModelViewSet):
     queryset = models.Account.objects.all()
     serializer_class = serializers.AccountSerializer
     permission_classes = (permissions.JoggerPermissions,)
+    filter_backends = (permissions.JoggerPermissionsFilter,)
 
     def get_serializer_class(self):
         if self.action == "trips":
             return serializers.TripSerializer
         return super().get_serializer_class()
 
-    def get_queryset(self):
-        acc = get_object_or_404(models.Account, pk=self.request.user.id)
-        if acc.is_superuser:
-            return self.queryset
-        return self.queryset.filter(pk=acc.id)
+    @property
+    def paginator(self):
+        if self.action == "trips" and not hasattr(self, "_paginator"):
+            self._paginator = pagination.TripPagination()
+        return super().paginator
 
     @action(
         methods=[Methods.GET, Methods.PUT, Methods.PATCH, Methods.DELETE], detail=False
@@ -163,11 +237,14 @@ class AccountViewSet(viewsets.ModelViewSet):
         """
         Handle showing, updating and deletion of account
         """
-        obj = get_object_or_404(models.Account, pk=request.user.id)
+        obj = get_account(request)
         if request.method == Methods.GET:
-            obj = get_object_or_404(models.Account, pk=request.user.id)
-            serializer = self.get_serializer(obj)
-            response = Response(serializer.data)
+            fields = serializers.AccountSerializer.Meta.fields
+            response = conditional_response(
+                request,
+                lambda: Response(self.get_serializer(obj).data),
+                utils.etag([getattr(obj, field) for field in fields]),
+            )
         elif request.method in [Methods.PUT, Methods.PATCH]:
             partial = kwargs.pop("partial", request.method == Methods.PATCH)
             serializer = self.get_serializer(obj, data=request.data, partial=partial)
@@ -189,31 +266,83 @@ class AccountViewSet(viewsets.ModelViewSet):
         """
         Handle viewing and adding of managed user jogging sessions
         """
-        mgr = request.user
-        acc = get_object_or_404(models.Account, pk=user_id)
-        if all([mgr.id != acc.id, not mgr.is_superuser, mgr.id not in acc.managers]):
-            raise Http404()
-        if request.method == "GET":
-            trips = self.paginate_queryset(acc.trips.all())
-            serializer = self.get_serializer(
-                trips, many=True, context={"request": request}
+        acc = self._get_trips_account(user_id)
+        if request.method == "GET" and "since" in request.query_params:
+            response = Response(
+                get_trip_sync(
+                    acc.trips.all(), acc.deletions.all(), request.query_params
+                )
+            )
+        elif request.method == "GET":
+            trips = filter_trips(acc.trips.all(), request.query_params)
+            response = conditional_response(
+                request,
+                functools.partial(list_trips, self, trips),
+                get_trips_etag(acc.trips.all(), acc.deletions.all(), [acc.id]),
             )
-            response = self.get_paginated_response(serializer.data)
         else:
             # POST
-            result = create_trip(acc, request.data.copy(), request)
+            result = create_trip(acc, request.data, request)
             if result.errors:
                 response = Response(result.errors, status=status.HTTP_400_BAD_REQUEST)
             else:
                 response = Response(result.data, status=status.HTTP_201_CREATED)
         return response
 
+    @action(
+        methods=[Methods.GET], detail=False, url_path="(?P<user_id>[0-9]+)/trips/stats"
+    )
+    def trip_stats(self, request, user_id):
+        """
+        Handle reporting of managed user jogging session totals
+        """
+        acc = self._get_trips_account(user_id)
+        return Response(get_trip_stats(acc.rollups.all(), request.query_params))
+
+    @action(
+        methods=[Methods.GET], detail=False, url_path="(?P<user_id>[0-9]+)/trips/export"
+    )
+    def trip_export(self, request, user_id):
+        """
+        Handle streaming of managed user full jogging history
+        """
+        acc = self._get_trips_account(user_id)
+        export_type = request.query_params.get("type", "csv")
+        if export_type not in exports.FORMATS:
+            utils.raise_api_exc(
+                APIException("unsupported export type"), status.HTTP_400_BAD_REQUEST
+            )
+        content_type, lines = exports.FORMATS[export_type]
+        trips = acc.trips.order_by("date_created", "id")
+        rows = (
+            filter_trips(trips, request.query_params)
+            .values_list(*exports.COLUMNS)
+            .iterator(chunk_size=Limits.TRIP_EXPORT_CHUNK)
+        )
+        response = StreamingHttpResponse(lines(rows), content_type=content_type)
+        response["Content-Disposition"] = 'attachment; filename="trips-{}.{}"'.format(
+            acc.id, export_type
+        )
+        return response
+
+    def _get_trips_account(self, user_id):
+        """
+        Get account whose trips the requesting user can access
+        :raises Http404: if account is not the user or managed by them
+        """
+        mgr = self.request.user
+        acc = get_object_or_404(models.Account, pk=user_id)
+        managing = models.Account.get_managing(mgr.id)
+        if all([mgr.id != acc.id, not mgr.is_superuser, acc.id not in managing]):
+            raise Http404()
+        return acc
+
     @action(methods=[Methods.GET, Methods.POST, Methods.DELETE], detail=False)
     def managers(self, request):
         """
         Handle listing and adding accounts that can manage user
         """
-        user = get_object_or_404(models.Account, pk=request.user.id)
+        user = get_account(request)
         method = request.method
         response_data = None
         response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -233,8 +362,8 @@ class AccountViewSet(viewsets.ModelViewSet):
                     )
                 mgr = get_object_or_404(models.Account, email=mgr_email)
                 if method == Methods.POST:
-                    auth = auth_manager(user=user, mgr=mgr)
-                    self._send_manage_request_mail(user, mgr_email, auth)
+                    _, auth_code = auth_manager(user=user, mgr=mgr)
+                    self._send_manage_request_mail(user, mgr_email, auth_code)
                     response_data = self.get_serializer(mgr).data
                     response_status = status.HTTP_202_ACCEPTED
                 else:
@@ -247,14 +376,14 @@ class AccountViewSet(viewsets.ModelViewSet):
                 )
         return Response(data=response_data, status=response_status)
 
-    def _send_manage_request_mail(self, user, mgr_email, auth):
+    def _send_manage_request_mail(self, user, mgr_email, code):
         """
         Send mail to manager requested for confirmation
         """
         confirm_link = "{}?code={}".format(
-            self.request.build_absolute_uri(reverse("account-managing")), auth.code
+            self.request.build_absolute_uri(reverse("account-managing")), code
         )
-        send_mail(
+        models.Mail.queue(
             sender=MAIL_FROM,
             recievers=[mgr_email],
             subject="Account Manage Request",
@@ -269,7 +398,7 @@ class AccountViewSet(viewsets.ModelViewSet):
         cancel_link = "{}?email={}".format(
             self.request.build_absolute_uri(reverse("account-managers")), mgr_email
         )
-        send_mail(
+        models.Mail.queue(
             sender=MAIL_FROM,
             recievers=[user.email],
             subject="Account Manager Request",
@@ -285,7 +414,7 @@ class AccountViewSet(viewsets.ModelViewSet):
         """
         Handle listing and updating account user is currently managing
         """
-        mgr = get_object_or_404(models.Account, pk=request.user.id)
+        mgr = get_account(request)
         method = request.method
         response_data = None
         response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -297,8 +426,7 @@ class AccountViewSet(viewsets.ModelViewSet):
         elif method == Methods.POST:
             if utils.has_required(request.data.keys(), {"code"}):
                 auth_code = request.data["code"]
-                auth = get_object_or_404(models.Auth, code=auth_code, owner_id=mgr.id)
-                auth.activate()
+                auth = confirm_manager(code=auth_code, mgr=mgr)
                 response_data = self.get_serializer(auth.user).data
                 response_status = status.HTTP_200_OK
             else:
@@ -320,35 +448,70 @@ class AccountViewSet(viewsets.ModelViewSet):
         return Response(data=response_data, status=response_status)
 
 
-def auth_manager(user, mgr):
+def check_manage_limits(user_id, mgr_id):
     """
-    Authorise and notify manager for user account
+    Check manager can be authorised on user account
     :raises APIException: if manager already authorized
     :raises APIException: if manager managing at limit
     :raises APIException: if user manager count at limit
     """
-    if mgr.id in user.managers:
+    counts = models.Account.count_manage(user_id=user_id, owner_id=mgr_id)
+    if counts["authorised"]:
         utils.raise_api_exc(
             APIException("email already authorised"), status.HTTP_400_BAD_REQUEST
         )
-    if len(mgr.managing) >= Limits.ACCOUNT_MANAGED:
+    if counts["managing"] >= Limits.ACCOUNT_MANAGED:
         utils.raise_api_exc(
             APIException("account is managing more than enough"),
             status.HTTP_406_NOT_ACCEPTABLE,
         )
-    if len(user.managers) >= Limits.ACCOUNT_MANAGER:
+    if counts["managers"] >= Limits.ACCOUNT_MANAGER:
         utils.raise_api_exc(
             APIException("account has more than enough managers"),
             status.HTTP_406_NOT_ACCEPTABLE,
         )
 
-    mgr_scope = models.Scope.objects.get(codename=PermissionCodes.Account.MANAGE)
-    deauth_manager(user=user, mgr=mgr)
-    auth = models.Auth.objects.create(
-        owner=mgr, user=user, active=False, code=get_random_string(128)
-    )
-    auth.scopes.set({mgr_scope})
-    auth.save()
+
+def auth_manager(user, mgr):
+    """
+    Authorise and notify manager for user account
+    Limits are checked and the authorisation written in one transaction
+    :raises APIException: if manager cannot be authorised
+    :returns tuple: pending auth and plain code to confirm it with
+    """
+    mgr_scope = models.Account.get_manage_scope()
+    auth_code = get_random_string(128)
+    with transaction.atomic():
+        models.Account.lock([user.id, mgr.id])
+        check_manage_limits(user_id=user.id, mgr_id=mgr.id)
+        deauth_manager(user=user, mgr=mgr)
+        auth = models.Auth.compact(user.id, mgr.id, mgr_scope)
+        if auth is None:
+            auth = models.Auth(owner=mgr, user=user, active=False)
+            auth.set_code(auth_code)
+            auth.save()
+            auth.scopes.add(mgr_scope)
+        else:
+            auth.set_code(auth_code, True)
+    models.Account.forget_manage(user.id, mgr.id)
+    return auth, auth_code
+
+
+def confirm_manager(code, mgr):
+    """
+    Activate pending manager authorisation if limits still allow it
+    :raises Http404: if no pending authorisation has code
+    :raises APIException: if manager cannot be authorised
+    :returns Auth: activated authorisation
+    """
+    pending = models.Auth.get_pending(code).filter(owner_id=mgr.id)
+    user_id = get_object_or_404(pending.values_list("user_id", flat=True))
+    with transaction.atomic():
+        # both accounts locked in one call, ordered like auth_manager
+        models.Account.lock([user_id, mgr.id])
+        auth = get_object_or_404(pending, user_id=user_id)
+        check_manage_limits(user_id=user_id, mgr_id=mgr.id)
+        auth.activate()
     return auth
 
 
@@ -356,11 +519,13 @@ def deauth_manager(user, mgr):
     """
     Deauthorise all manager auth on user account
     """
-    return (
+    updated = (
         models.Account.get_manage_scope()
         .auths.filter(user=user, owner=mgr)
-        .update(active=False, code=None)
+        .update(active=False, code=None, code_expires=None)
     )
+    models.Account.forget_manage(user.id, mgr.id)
+    return updated
 
 
 class TripViewSet(viewsets.ModelViewSet):
@@ -371,24 +536,243 @@ class TripViewSet(viewsets.ModelViewSet):
     queryset = models.Trip.objects.all()
     serializer_class = serializers.TripSerializer
     permission_classes = (permissions.JoggerPermissions,)
+    filter_backends = (permissions.JoggerPermissionsFilter,)
+    pagination_class = pagination.TripPagination
 
     def create(self, request, *_, **__):
-        result = create_trip(request.user, request.data.copy(), request)
+        result = create_trip(request.user, request.data, request)
         if result.errors:
             return Response(result.errors, status=status.HTTP_400_BAD_REQUEST)
         return Response(result.data, status=status.HTTP_201_CREATED)
 
-    def get_queryset(self):
-        acc = get_object_or_404(models.Account, pk=self.request.user.id)
-        if acc.is_superuser:
-            return self.queryset
-        return self.queryset.filter(account_id__in=({acc.id} | acc.managing))
+    def list(self, request, *args, **kwargs):
+        trips = self.filter_queryset(self.get_queryset())
+        deletions = permissions.JoggerPermissionsFilter().filter_queryset(
+            request, models.TripDeletion.objects.all(), self
+        )
+        if "since" in request.query_params:
+            return Response(get_trip_sync(trips, deletions, request.query_params))
+        account_ids = permissions.JoggerPermissionsFilter.get_account_ids(request)
+        filtered = filter_trips(trips, request.query_params)
+        return conditional_response(
+            request,
+            functools.partial(list_trips, self, filtered),
+            get_trips_etag(trips, deletions, account_ids),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        trip = self.get_object()
+        return conditional_response(
+            request,
+            lambda: Response(self.get_serializer(trip).data),
+            utils.etag([trip.id, trip.date_updated]),
+            trip.date_updated,
+        )
+
+    def perform_destroy(self, instance):
+        trip_id = instance.id
+        with transaction.atomic():
+            instance.delete()
+            instance.id = trip_id
+            models.TripDeletion.record([instance])
+
+    @action(methods=[Methods.GET], detail=False)
+    def stats(self, request):
+        """
+        Handle reporting of jogging session totals on all accessible accounts
+        """
+        rollups = permissions.JoggerPermissionsFilter().filter_queryset(
+            request, models.TripRollup.objects.all(), self
+        )
+        return Response(get_trip_stats(rollups, request.query_params))
+
+
+def conditional_response(request, render, etag, last_modified=None):
+    """
+    Respond not modified if the client copy of a resource is current
+    Validators are sent on the response either way
+    :param request: request with conditional headers
+    :param render: callable returning the full response
+    :param str etag: quoted entity tag of resource
+    :param datetime last_modified: time resource last changed if known
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = render()
+    response["ETag"] = etag
+    if timestamp is not None:
+        response["Last-Modified"] = http_date(timestamp)
+    return response
+
+
+def get_trips_etag(trips, deletions, account_ids):
+    """
+    Entity tag of a trip list from one aggregate query over all listed accounts
+    Built from trips before filters so edits moving a trip out of a filtered
+    list change it too, no count is taken so cursor pages stay count free
+    :param trips: queryset of trips of listed accounts
+    :param deletions: queryset of trip deletions of listed accounts
+    :param account_ids: ids of listed accounts, None when listing all
+    """
+    stats = trips.order_by().aggregate(last_id=Max("id"), updated=Max("date_updated"))
+    stats.update(deletions.order_by().aggregate(deleted=Max("date_deleted")))
+    stats["accounts"] = None if account_ids is None else sorted(account_ids)
+    return utils.etag(stats)
+
+
+def list_trips(view, trips):
+    """
+    Page of trips read as values and represented without model instances
+    :param view: view paginating the trips
+    :param trips: queryset of trips to list
+    """
+    rows = trips.values(*serializers.TripSerializer.VALUES)
+    page = view.paginate_queryset(rows)
+    if page is None:
+        return Response(serializers.TripSerializer.represent_values(rows))
+    return view.get_paginated_response(
+        serializers.TripSerializer.represent_values(page)
+    )
+
+
+def get_trip_sync(trips, deletions, params):
+    """
+    Trips changed and deleted after the watermark in params
+    Changes are paged in order up to TRIP_SYNC_LIMIT, changes stamped within
+    TRIP_SYNC_OVERLAP of now may still have uncommitted neighbours stamped
+    earlier so they are sent again by the next sync, clients dedupe by id
+    :param trips: queryset of trips to sync
+    :param deletions: queryset of trip deletions to sync
+    :param params: query parameters with since watermark
+    :raises ValidationError: if watermark is missing or invalid
+    """
+    filters = serializers.TripSyncFilterSerializer(data=params)
+    filters.is_valid(raise_exception=True)
+    since = filters.validated_data["since"]
+    horizon = timezone.now() - timedelta(seconds=Limits.TRIP_SYNC_OVERLAP)
+    limit = Limits.TRIP_SYNC_LIMIT
+    changed = trips.filter(date_updated__gt=since).order_by("date_updated", "id")
+    deleted = (
+        deletions.filter(date_deleted__gt=since)
+        .order_by("date_deleted", "id")
+        .values_list("trip_id", "date_deleted")
+    )
+    # only settled changes are limited so every page moves the watermark
+    overflow = []
+    for rows, field in ((changed, "date_updated"), (deleted, "date_deleted")):
+        settled = rows.filter(**{field + "__lte": horizon})
+        stamps = list(settled.values_list(field, flat=True)[: limit + 1])
+        if len(stamps) > limit:
+            overflow.append(stamps[limit - 1])
+    if overflow:
+        boundary = min(overflow)
+        changed = changed.filter(date_updated__lte=boundary)
+        deleted = deleted.filter(date_deleted__lte=boundary)
+    changed, deleted = list(changed), list(deleted)
+    if overflow:
+        watermark = boundary
+    else:
+        latest = max(
+            [since]
+            + [trip.date_updated for trip in changed]
+            + [date_deleted for _, date_deleted in deleted]
+        )
+        watermark = max(since, min(latest, horizon))
+    return serializers.TripSyncSerializer(
+        {
+            "watermark": watermark,
+            "trips": changed,
+            "deleted": [trip_id for trip_id, _ in deleted],
+            "has_more": bool(overflow),
+        }
+    ).data
+
+
+def filter_trips(trips, params):
+    """
+    Trips matching the filters and ordering in params
+    :param trips: trip queryset to filter
+    :param params: query parameters with optional bounds and ordering
+    :raises ValidationError: if parameters are invalid
+    """
+    query = serializers.TripFilterSerializer(data=params)
+    query.is_valid(raise_exception=True)
+    options = query.validated_data
+    lookups = {
+        "start": "date_created__gte",
+        "end": "date_created__lte",
+        "min_distance": "length_distance__gte",
+        "max_distance": "length_distance__lte",
+        "min_time": "length_time__gte",
+        "max_time": "length_time__lte",
+        "min_pace": "pace__gte",
+        "max_pace": "pace__lte",
+    }
+    if "min_pace" in options or "max_pace" in options:
+        # seconds per kilometre, trips without distance have no pace
+        trips = trips.annotate(
+            pace=Cast("length_time", FloatField()) * 1000 / NullIf("length_distance", 0)
+        )
+    trips = trips.filter(
+        **{lookups[key]: value for key, value in options.items() if key in lookups}
+    )
+    ordering = options.get("ordering")
+    if ordering:
+        trips = trips.order_by(ordering, "-id" if ordering[0] == "-" else "id")
+    return trips
+
+
+def get_trip_stats(rollups, params):
+    """
+    Total trips per reporting period from the trip rollups
+    :param rollups: trip rollup queryset to report on
+    :param params: query parameters with period and optional date range
+    :raises ValidationError: if parameters are invalid
+    """
+    query = serializers.TripStatsFilterSerializer(data=params)
+    query.is_valid(raise_exception=True)
+    options = query.validated_data
+    start, end = options.get("start"), options.get("end")
+    aligned = all(
+        [
+            options["period"] == Periods.WEEK,
+            start is None or start.weekday() == 0,
+            end is None or end.weekday() == 6,
+        ]
+    )
+    # whole weeks are read from weekly rollups, anything else from daily
+    rollups = rollups.filter(period=Periods.WEEK if aligned else Periods.DAY)
+    if start:
+        rollups = rollups.filter(date__gte=start)
+    if end:
+        rollups = rollups.filter(date__lte=end)
+    trunc = TruncMonth if options["period"] == Periods.MONTH else TruncWeek
+    totals = (
+        rollups.order_by()
+        .annotate(report_period=trunc("date"))
+        .values("report_period")
+        .annotate(
+            total_trips=Sum("trips"),
+            total_distance=Sum("length_distance"),
+            total_time=Sum("length_time"),
+        )
+        .annotate(
+            average_speed=Cast("total_distance", FloatField()) / NullIf("total_time", 0)
+        )
+        .order_by("report_period")
+    )
+    return serializers.TripStatsSerializer(totals, many=True).data
 
 
 def create_trip(account, data, request=None):
     """
     Create trip on account using data
+    Creates all trips in one transaction if data is a list
     """
+    if isinstance(data, list):
+        return create_trips(account, data, request)
+    data = data.copy()
     for k in ["account", "account_id"]:
         if k in data:
             del data[k]
@@ -398,3 +782,20 @@ def create_trip(account, data, request=None):
     if serializer.is_valid():
         serializer.save()
     return serializer
+
+
+def create_trips(account, data, request=None):
+    """
+    Create list of trips on account using data
+    Nothing is created if any of the trips is invalid
+    """
+    setattr(request, "user", account)
+    serializer = serializers.TripSerializer(
+        data=data,
+        many=True,
+        max_length=Limits.TRIP_BULK,
+        context={"request": request},
+    )
+    if serializer.is_valid():
+        serializer.save()
+    return serializer
@@ -29,6 +29,7 @@ EXTERNAL_APPS = [
     "django.contrib.staticfiles",
     "django_extensions",
     "rest_framework",
+    "rest_framework.authtoken",
 ]
 # internal app definitions
 INTERNAL_APPS = ["api"]
@@ -43,6 +44,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.RequestCacheMiddleware",
+    "api.middleware.ReadReplicaMiddleware",
 ]
 
 ROOT_URLCONF = "jogger.urls"
@@ -78,12 +81,66 @@ DATABASES = {
         "TEST": {"NAME": os.path.join(BASE_DIR, DB_TEST)},
     }
 }
+# Production sqlite profile, pragmas applied per connection by api.signals
+DB_TUNE = int(os.getenv("DB_TUNE") or False)
+SQLITE_TUNED_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("DB_CACHE_KB", "65536")),
+    "busy_timeout": int(os.getenv("DB_BUSY_TIMEOUT", "5000")),
+}
+SQLITE_TUNED_DATABASE = {
+    "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "600")),
+    "CONN_HEALTH_CHECKS": True,
+    "OPTIONS": {"timeout": SQLITE_TUNED_PRAGMAS["busy_timeout"] / 1000},
+}
+SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS if DB_TUNE else {}
+if DB_TUNE:
+    DATABASES["default"].update(SQLITE_TUNED_DATABASE)
+# Read replicas as comma separated names, copies of the default database
+DATABASE_REPLICAS = []
+for index, name in enumerate(filter(None, os.getenv("DB_REPLICAS", "").split(","))):
+    alias = "replica{}".format(index)
+    DATABASES[alias] = dict(
+        DATABASES["default"],
+        NAME=os.path.join(BASE_DIR, "db.sqlite3." + name.strip()),
+        TEST={"MIRROR": "default"},
+    )
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["api.routers.ReplicaRouter"]
+
+# Cache, scope and token invalidation only reaches other workers through a
+# shared backend such as memcached, the default local memory cache is per process
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
 
 # SMTP
 SMTP_HOST = os.getenv("SMTP_HOST", "")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "0"))
 SMTP_USER = os.getenv("SMTP_USER", "")
 
+# Trips inserted per query on bulk upload
+TRIP_BATCH_SIZE = int(os.getenv("TRIP_BATCH_SIZE", "500"))
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+PASSWORD_ITERATIONS = int(os.getenv("PASSWORD_ITERATIONS", "0"))
+PASSWORD_HASHERS = [
+    "api.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+    "api.hashers.HMACSHA256PasswordHasher",
+]
 
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
@@ -99,6 +156,17 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.DjangoModelPermissions"],
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+        "api.authentication.AccountTokenAuthentication",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        "api.parsers.NDJSONParser",
+    ],
     "COERCE_DECIMAL_TO_STRING": False,
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 10,